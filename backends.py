@@ -0,0 +1,362 @@
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from gradio_client import Client, file
+from metrics import timer, inc
+from resilience import CircuitBreaker, CircuitOpenError, BACKEND_TIMEOUT, BACKEND_RETRIES, call_with_retries, is_transient
+
+# Space do Hugging Face usado para o face swap
+SPACE_ID = "felixrosberg/face-swap"
+
+# Backend ativo: "remote" (Space), "local" (CPU, sem chamadas externas)
+# ou "stub" (cliente Gradio falso, para testes offline)
+FACE_SWAP_BACKEND = os.environ.get("FACE_SWAP_BACKEND", "remote")
+
+# Quantidade máxima de clientes abertos ao mesmo tempo
+CLIENT_POOL_SIZE = int(os.environ.get("CLIENT_POOL_SIZE", "4"))
+
+# Tempo máximo para criar um cliente (handshake com o Space, que pode estar
+# acordando ou em build), em segundos
+CLIENT_CREATE_TIMEOUT = float(os.environ.get("CLIENT_CREATE_TIMEOUT", "30"))
+
+# Clientes parados há mais tempo que isso passam por um health check antes do uso
+CLIENT_HEALTH_CHECK_AFTER = float(os.environ.get("CLIENT_HEALTH_CHECK_AFTER", "60"))
+
+# Latência simulada do backend stub, em segundos
+STUB_LATENCY = float(os.environ.get("FACE_SWAP_STUB_LATENCY", "0.5"))
+
+# Caminho local de um argumento criado com gradio_client.file()
+def _file_path(value):
+    if isinstance(value, dict):
+        return value.get("path")
+    return str(value)
+
+# Cliente falso com a mesma interface do gradio_client.Client.
+# Devolve uma cópia da imagem de estilo após `latency` segundos.
+class StubClient:
+    def __init__(self, latency=STUB_LATENCY):
+        self.latency = latency
+        self.calls = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def predict(self, source, target, slider=100, adv_slider=100, settings=None, api_name=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        result = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
+        result.close()
+        shutil.copyfile(_file_path(target), result.name)
+        return result.name
+
+    # Como Client.submit: retorna um job com result(timeout) e cancel()
+    def submit(self, *args, **kwargs):
+        return self._executor.submit(self.predict, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+# Health check de um cliente: para o Space consulta o /config
+def check_client_health(client):
+    if isinstance(client, StubClient):
+        return True
+    try:
+        response = httpx.get(
+            urllib.parse.urljoin(client.src, "config"),
+            headers=client.headers,
+            timeout=5
+        )
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+def _close_client(client):
+    try:
+        client.close()
+    except Exception:
+        pass
+
+# Cria o cliente numa thread e espera no máximo `timeout` segundos. O
+# gradio_client não tem timeout no handshake (e espera em loop enquanto o
+# Space está em build); se o tempo estourar, o cliente que ainda vier a ser
+# criado é fechado e descartado.
+def create_client(factory, timeout=CLIENT_CREATE_TIMEOUT):
+    if timeout is None:
+        return factory()
+
+    outcome = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def run():
+        try:
+            client, error = factory(), None
+        except Exception as e:
+            client, error = None, e
+        with lock:
+            if outcome.get("abandoned"):
+                if client is not None:
+                    _close_client(client)
+            else:
+                outcome["client"], outcome["error"] = client, error
+        done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    done.wait(timeout)
+    with lock:
+        if "error" not in outcome:
+            outcome["abandoned"] = True
+            raise TimeoutError(f"O serviço de face swap não respondeu em {timeout:.0f}s")
+    if outcome["error"] is not None:
+        raise outcome["error"]
+    return outcome["client"]
+
+# Pool de clientes compartilhado entre sessões e reruns.
+# Os clientes são criados sob demanda (o handshake com o Space só acontece
+# no primeiro uso) e descartados após qualquer erro, para serem recriados.
+class ClientPool:
+    def __init__(self, factory, size=CLIENT_POOL_SIZE, health_check=check_client_health,
+                 health_check_after=CLIENT_HEALTH_CHECK_AFTER, create_timeout=CLIENT_CREATE_TIMEOUT):
+        self.size = size
+        self.create_timeout = create_timeout
+        self._factory = factory
+        self._health_check = health_check
+        self._health_check_after = health_check_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._created
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    def _close(self, client):
+        with self._lock:
+            self._created -= 1
+        _close_client(client)
+
+    def _acquire(self, timeout):
+        # Cada cliente emprestado ocupa uma vaga; sem vaga, espera a devolução
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Nenhum cliente de face swap disponível no momento")
+
+        try:
+            # Reaproveita um cliente ocioso (o mais recente primeiro)
+            while True:
+                try:
+                    client, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if time.monotonic() - last_used < self._health_check_after or self._health_check(client):
+                    return client
+                self._close(client)
+
+            client = create_client(self._factory, self.create_timeout)
+            with self._lock:
+                self._created += 1
+            return client
+        except Exception:
+            self._slots.release()
+            raise
+
+    # Empresta um cliente; em caso de erro ele é descartado em vez de devolvido
+    @contextmanager
+    def client(self, timeout=None):
+        client = self._acquire(timeout)
+        try:
+            yield client
+        except BaseException:
+            self._close(client)
+            self._slots.release()
+            raise
+        self._idle.put((client, time.monotonic()))
+        self._slots.release()
+
+    # Cria um cliente antecipadamente, para o primeiro usuário não pagar o handshake
+    def warm_up(self):
+        with self.client():
+            pass
+
+    def close(self):
+        while True:
+            try:
+                client, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(client)
+
+# Cria o pool de clientes Gradio ("remote" usa o Space, "stub" o cliente falso)
+def create_client_pool(hf_token=None, backend=FACE_SWAP_BACKEND, size=CLIENT_POOL_SIZE):
+    if backend == "stub":
+        factory = StubClient
+    elif backend == "remote":
+        def factory():
+            return Client(SPACE_ID, hf_token=hf_token, verbose=False)
+    else:
+        raise ValueError(f"Backend de face swap desconhecido: {backend}")
+    return ClientPool(factory, size=size)
+
+# Interface dos backends de face swap: recebem os caminhos da foto e do
+# estilo e retornam os bytes da imagem resultante
+class FaceSwapBackend:
+    name = "base"
+    # Swaps simultâneos que o backend aguenta; None usa o padrão da fila (JOB_WORKERS)
+    workers = None
+
+    def swap(self, source_path, target_path, slider=100, adv_slider=100):
+        raise NotImplementedError
+
+    # Aquece o backend (conexões, modelos) antes do primeiro pedido
+    def warm_up(self):
+        pass
+
+    # Health check: se o backend está respondendo
+    def health(self):
+        return True
+
+    # Falha na hora (CircuitOpenError) se o backend estiver indisponível
+    def check(self):
+        pass
+
+    def close(self):
+        pass
+
+# Backend remoto: o Space do Hugging Face, através do pool de clientes Gradio
+class RemoteBackend(FaceSwapBackend):
+    def __init__(self, pool, name="remote", timeout=BACKEND_TIMEOUT):
+        self.pool = pool
+        self.name = name
+        self.timeout = timeout
+
+    def swap(self, source_path, target_path, slider=100, adv_slider=100):
+        # Cliente do modelo, emprestado do pool; no timeout o cliente é descartado
+        with self.pool.client() as client:
+            job = client.submit(
+                source=file(source_path),  # Sua foto (rosto)
+                target=file(target_path),  # Estilo de cabelo desejado
+                slider=slider,  # Intensidade do swap
+                adv_slider=adv_slider,  # Configurações avançadas
+                settings=[],
+                api_name="/run_inference"
+            )
+            try:
+                with timer("backend_predict_seconds", backend=self.name):
+                    result = job.result(timeout=self.timeout)
+            except TimeoutError:
+                job.cancel()
+                raise TimeoutError(f"O face swap passou de {self.timeout:.0f}s")
+
+        with open(result, "rb") as f:
+            result_bytes = f.read()
+        # O arquivo baixado do backend não é mais necessário; o resultado fica em memória/cache
+        os.unlink(result)
+        return result_bytes
+
+    def warm_up(self):
+        self.pool.warm_up()
+
+    def health(self):
+        try:
+            with self.pool.client(timeout=5) as client:
+                return check_client_health(client)
+        except Exception:
+            return False
+
+    def close(self):
+        self.pool.close()
+
+# Camada de resiliência em volta de outro backend: erros transitórios são
+# repetidos com espera exponencial e jitter, e um disjuntor compartilhado faz
+# as chamadas falharem na hora enquanto o backend estiver fora. Cada tentativa
+# que falha conta no disjuntor, e as tentativas param assim que ele abrir.
+# Quando o disjuntor libera a chamada de teste, o health check roda antes do swap.
+class ResilientBackend(FaceSwapBackend):
+    def __init__(self, backend, breaker=None, retries=BACKEND_RETRIES):
+        self.backend = backend
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.name = backend.name
+        self.workers = backend.workers
+
+    def check(self):
+        self.breaker.check()
+
+    def swap(self, source_path, target_path, slider=100, adv_slider=100):
+        trial = self.breaker.before_call()
+        if trial and not self.backend.health():
+            self.breaker.record_failure()
+            raise CircuitOpenError(self.breaker.retry_after)
+
+        attempts = []
+
+        def attempt():
+            # Outras chamadas podem ter aberto o circuito durante a espera
+            if attempts:
+                self.breaker.check()
+            attempts.append(1)
+            try:
+                return self.backend.swap(source_path, target_path, slider=slider, adv_slider=adv_slider)
+            except Exception as e:
+                if is_transient(e):
+                    self.breaker.record_failure()
+                raise
+
+        try:
+            # A chamada de teste não insiste: uma falha reabre o circuito
+            result = call_with_retries(attempt, attempts=1 if trial else self.retries)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            # Um erro do próprio pedido mostra que o backend está respondendo
+            if not is_transient(e):
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def warm_up(self):
+        self.backend.warm_up()
+
+    def health(self):
+        return self.backend.health()
+
+    def close(self):
+        self.backend.close()
+
+# Cria o backend configurado em FACE_SWAP_BACKEND
+def create_backend(name=FACE_SWAP_BACKEND, hf_token=None):
+    if name in ("remote", "stub"):
+        return ResilientBackend(RemoteBackend(create_client_pool(hf_token=hf_token, backend=name), name=name))
+    if name == "local":
+        # Importado só quando usado, para não carregar o modelo à toa
+        from local_backend import LocalBackend
+        return LocalBackend()
+    raise ValueError(f"Backend de face swap desconhecido: {name}")
+
+# Executa o face swap no backend, passando pelo cache de resultados; retorna bytes da imagem
+def face_swap(backend, result_cache, source_path, target_path, cache_key=None, slider=100, adv_slider=100):
+    # Resultado já calculado para a mesma foto, estilo e parâmetros
+    if cache_key is not None:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        with timer("backend_swap_seconds", backend=backend.name):
+            result_bytes = backend.swap(source_path, target_path, slider=slider, adv_slider=adv_slider)
+    except Exception as e:
+        inc("backend_errors_total", backend=backend.name, error=type(e).__name__)
+        raise
+    if cache_key is not None:
+        result_cache.put(cache_key, result_bytes)
+    return result_bytes
@@ -1,20 +1,33 @@
 import streamlit as st
 import os
-import tempfile
 from PIL import Image
 import time
-from gradio_client import Client, file
-import base64
 from io import BytesIO
 from streamlit_webrtc import webrtc_streamer, WebRtcMode
-import av
-import cv2
-import numpy as np
 import uuid
 import warnings
+from image_utils import resize_image, encode_jpeg, decode_upload, upload_fingerprint, InvalidImageError
+from preprocessing import prepare_source
+from thumbnails import get_thumbnail
+from catalog import load_catalog, CatalogError
+from style_index import load_or_build_index, embed_pil
+from backends import face_swap
+from resilience import CircuitOpenError
+from result_cache import result_key
+from temp_files import TempFileManager, TempSession, ImagePayload
+from batch import BatchSwap
+from prefetch import Prefetcher, prefetch_order, PREFETCH_ENABLED
+from video_processor import VideoProcessor
+from face_detection import TARGET_FPS
+from job_queue import QueueFullError, QUEUED, RUNNING, DONE, ERROR
+from metrics import metrics, timer
+from services import get_backend, get_result_cache, get_job_queue, setup_metrics
 
 warnings.filterwarnings("ignore")
 
+# Início desta execução do script, para a métrica script_run_seconds
+script_started_at = time.perf_counter()
+
 # Configuração da página
 st.set_page_config(
     page_title="Barbearia Virtual - Face Swap",
@@ -26,6 +39,18 @@ st.set_page_config(
 # Tamanho padrão para as imagens
 STANDARD_IMAGE_SIZE = (400, 400)  # Largura, Altura
 
+# Diretório onde as imagens dos estilos estão armazenadas
+STYLES_DIR = "styles"  # Altere para o caminho do seu diretório
+
+# Número de estilos por página (3 colunas x 2 linhas = 6)
+STYLES_PER_PAGE = 6
+
+# Aba da galeria com os estilos recomendados para a foto do usuário
+RECOMMENDED_CATEGORY = "⭐ Para você"
+
+# Limite de swaps simultâneos que o modo de comparação pode pedir
+BATCH_MAX_PARALLELISM = int(os.environ.get("BATCH_MAX_PARALLELISM", "4"))
+
 # Estilo CSS personalizado
 st.markdown("""
     <style>
@@ -49,7 +74,7 @@ st.markdown("""
     .gallery-item:hover {
         transform: scale(1.05);
     }
-    .result-container {
+    .st-key-result_container {
         padding: 20px;
         background-color: white;
         border-radius: 10px;
@@ -75,101 +100,281 @@ if 'uploaded_image' not in st.session_state:
     st.session_state['uploaded_image'] = None
 if 'selected_style' not in st.session_state:
     st.session_state['selected_style'] = None
-if 'result_image' not in st.session_state:
-    st.session_state['result_image'] = None
+if 'result_bytes' not in st.session_state:
+    st.session_state['result_bytes'] = None
 if 'camera_image' not in st.session_state:
     st.session_state['camera_image'] = None
-if 'processing' not in st.session_state:
-    st.session_state['processing'] = False
+if 'swap_job' not in st.session_state:
+    st.session_state['swap_job'] = None
+if 'new_result' not in st.session_state:
+    st.session_state['new_result'] = False
+if 'batch' not in st.session_state:
+    st.session_state['batch'] = None
 if 'photo_mode' not in st.session_state:
     st.session_state['photo_mode'] = "Fazer upload de imagem"
 
-# Função para redimensionar imagens mantendo a proporção
-def resize_image(image, target_size):
-    if image is None:
+# Arquivos temporários: o gerenciador e o sweeper (TTL) são únicos no processo
+@st.cache_resource
+def get_temp_file_manager():
+    manager = TempFileManager()
+    manager.start_sweeper()
+    return manager
+
+# Arquivos temporários desta sessão, apagados quando a sessão termina
+def get_temp_session():
+    if 'temp_session' not in st.session_state:
+        st.session_state['temp_session'] = TempSession(get_temp_file_manager())
+    return st.session_state['temp_session']
+
+# Arquivos compartilhados entre as sessões (alvos dos estilos)
+@st.cache_resource
+def get_shared_temp_session():
+    return TempSession(get_temp_file_manager())
+
+# Foto do usuário mantida em memória; só vira arquivo quando o backend precisa
+def get_source_payload(user_image):
+    payload = st.session_state.get('source_payload')
+    if payload is None or payload.image is not user_image:
+        payload = ImagePayload(user_image)
+        st.session_state['source_payload'] = payload
+    return payload
+
+# Guarda o resultado de um face swap na sessão para ser exibido
+def finish_face_swap(result_bytes):
+    result_img = resize_image(Image.open(BytesIO(result_bytes)), STANDARD_IMAGE_SIZE)
+    # Codificado uma única vez: exibição, download e reruns usam os mesmos bytes,
+    # servidos pelo Streamlit numa URL de mídia endereçada pelo conteúdo
+    st.session_state['result_bytes'] = encode_jpeg(result_img)
+    st.session_state['new_result'] = True
+
+# Enfileira o face swap; se o resultado já estiver em cache, conclui na hora.
+# Retorna o id do job, ou None quando não foi preciso enfileirar.
+# Com o backend fora do ar, levanta CircuitOpenError sem enfileirar.
+def submit_face_swap(source_payload, style):
+    cache_key = result_key(source_payload.digest, style['id'], backend=get_backend().name)
+    cached = get_result_cache().get(cache_key)
+    if cached is not None:
+        finish_face_swap(cached)
         return None
-    
-    if isinstance(image, np.ndarray):
-        # Se for numpy array (da câmera), converter para PIL Image
-        image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    
-    # Redimensionar mantendo a proporção
-    image.thumbnail(target_size, Image.Resampling.LANCZOS)
-    
-    # Criar uma nova imagem com fundo branco para o tamanho exato
-    new_image = Image.new("RGB", target_size, (255, 255, 255))
-    # Colar a imagem redimensionada no centro
-    new_image.paste(
-        image, 
-        ((target_size[0] - image.width) // 2, (target_size[1] - image.height) // 2)
+
+    get_backend().check()
+    return get_job_queue().submit(
+        face_swap,
+        get_backend(),
+        get_result_cache(),
+        source_payload.path(get_temp_session()),
+        get_style_target_path(style['id']),
+        cache_key=cache_key,
+        key=cache_key
     )
-    
-    return new_image
 
-# Função para salvar temporariamente uma imagem
-def save_temp_image(image, format="JPEG"):
-    if image is None:
-        return None
-    
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{format.lower()}")
-    image_path = temp_file.name
-    
-    if isinstance(image, np.ndarray):
-        # Converter de numpy array para PIL Image
-        image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-    
-    image.save(image_path, format=format)
-    return image_path
+# Swaps especulativos desta sessão (modo "adiantar o face swap")
+def get_prefetcher():
+    if st.session_state.get('prefetcher') is None:
+        st.session_state['prefetcher'] = Prefetcher(get_job_queue(), get_backend(), get_result_cache())
+    return st.session_state['prefetcher']
+
+# Atualiza o pré-processamento: o estilo selecionado e os seguintes da página atual da galeria
+def update_prefetch(user_image):
+    prefetcher = get_prefetcher()
+    source_payload = get_source_payload(user_image)
+    prefetcher.set_source(source_payload.path(get_temp_session()), source_payload.digest)
+    style_ids = prefetch_order(st.session_state['selected_style']['id'], st.session_state.get('gallery_page_ids', []))
+    prefetcher.request([{'id': style_id, 'path': get_style_target_path(style_id)} for style_id in style_ids])
+    prefetcher.step()
+
+# Mantém o pré-processamento andando enquanto o usuário navega
+@st.fragment(run_every=2)
+def run_prefetch():
+    prefetcher = get_prefetcher()
+    prefetcher.step()
+    if prefetcher.jobs:
+        st.caption(f"⚡ Adiantando {len(prefetcher.jobs)} estilo(s) em segundo plano")
+
+# Mensagem para quando o backend está instável, com a situação da fila
+def backend_unavailable_message(error):
+    job_queue = get_job_queue()
+    return f"⚠️ {error}. Fila: {job_queue.depth} aguardando, {job_queue.running} em processamento."
+
+# Acompanha o job de face swap da sessão: posição na fila, ETA e cancelamento
+@st.fragment(run_every=1)
+def show_swap_progress():
+    job_id = st.session_state.get('swap_job')
+    if job_id is None:
+        return
+
+    job_queue = get_job_queue()
+    status = job_queue.status(job_id)
+
+    if status is None or status['status'] not in (QUEUED, RUNNING):
+        st.session_state['swap_job'] = None
+        if status is not None and status['status'] == DONE:
+            finish_face_swap(status['result'])
+        elif status is not None and status['status'] == ERROR:
+            if isinstance(status['error'], CircuitOpenError):
+                st.session_state['swap_error'] = backend_unavailable_message(status['error'])
+            else:
+                st.session_state['swap_error'] = f"Erro ao processar face swap: {status['error']}"
+        st.rerun()
 
-# Função para realizar o face swap
-def face_swap(source_path, target_path):
+    # Backend fora do ar: os pedidos na fila só saem quando ele se recuperar
     try:
-        # Cliente do modelo
-        client = Client("felixrosberg/face-swap", hf_token=st.secrets["hungging"])
-        
-        # Executar o modelo
-        result = client.predict(
-            source=file(source_path),  # Sua foto (rosto)
-            target=file(target_path),  # Estilo de cabelo desejado
-            slider=100,  # Intensidade do swap
-            adv_slider=100,  # Configurações avançadas
-            settings=[],
-            api_name="/run_inference"
-        )
-        
-        # Carregar e retornar a imagem resultante
-        result_img = Image.open(result)
-        return result_img
-    
-    except Exception as e:
-        st.error(f"Erro ao processar face swap: {str(e)}")
-        return None
-
-# Função para processar o quadro da webcam
-class VideoProcessor:
-    def __init__(self):
-        self.current_frame = None
-    
-    def recv(self, frame):
-        img = frame.to_ndarray(format="bgr24")
-        
-        # Sempre manter o frame atual
-        self.current_frame = img.copy()
-        
-        # Desenha um contorno para o rosto, para indicar o posicionamento
-        try:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            for (x, y, w, h) in faces:
-                cv2.rectangle(img, (x, y), (x+w, y+h), (0, 255, 0), 2)
-                # Adicionar texto indicativo
-                cv2.putText(img, "Rosto detectado", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-        except:
-            pass  # Ignorar erros de detecção de rosto
-        
-        return av.VideoFrame.from_ndarray(img, format="bgr24")
+        get_backend().check()
+    except CircuitOpenError as e:
+        st.warning(backend_unavailable_message(e))
+
+    if status['status'] == QUEUED:
+        st.info(f"⏳ Na fila: posição {status['position']} - cerca de {status['eta']:.0f}s restantes")
+    else:
+        progress = status['elapsed'] / (status['elapsed'] + status['eta']) if status['eta'] else 0.99
+        st.progress(min(progress, 0.99), text=f"Processando o face swap... cerca de {status['eta']:.0f}s restantes")
+
+    if st.button("✖️ Cancelar", key="cancel_swap", disabled=status['status'] != QUEUED):
+        job_queue.cancel(job_id)
+        st.session_state['swap_job'] = None
+        st.rerun()
+
+# Grade de comparação do modo em lote: resultados, andamento ou erro de cada estilo
+def render_batch_grid(batch):
+    finished = len(batch.results) + len(batch.errors)
+    st.progress(finished / len(batch.styles), text=f"{finished} de {len(batch.styles)} estilos prontos")
+
+    for row_start in range(0, len(batch.styles), 3):
+        cols = st.columns(3)
+        for col, style in zip(cols, batch.styles[row_start:row_start + 3]):
+            with col:
+                if style['id'] in batch.results:
+                    st.image(batch.results[style['id']], caption=style['name'], use_container_width=True)
+                elif style['id'] in batch.errors:
+                    st.warning(f"{style['name']}: {batch.errors[style['id']]}")
+                elif style['id'] in batch.jobs:
+                    st.info(f"⏳ {style['name']}: processando...")
+                else:
+                    st.caption(f"{style['name']}: aguardando")
+
+# Acompanha o lote em andamento, enfileirando novos estilos conforme os anteriores terminam
+@st.fragment(run_every=1)
+def show_batch_progress():
+    batch = st.session_state['batch']
+    batch.step()
+    render_batch_grid(batch)
+
+    if batch.done:
+        st.rerun()
+
+    if st.button("✖️ Cancelar comparação", key="cancel_batch"):
+        batch.cancel()
+        st.rerun()
+
+# Catálogo de estilos (styles/catalog.json), carregado e validado uma única vez por processo
+@st.cache_resource
+def get_style_catalog():
+    return load_catalog(os.path.join(STYLES_DIR, "catalog.json"), STYLES_DIR)
+
+# Índice de vetores dos estilos (styles/style_index.npz), carregado uma única vez por processo
+@st.cache_resource
+def get_style_index():
+    return load_or_build_index(get_style_catalog())
+
+# Estilos mais próximos da foto do usuário (formato do rosto e cabelo).
+# O vetor da foto é calculado uma única vez, quando a foto chega.
+def get_recommended_styles(user_image):
+    if st.session_state.get('embedding_image') is not user_image:
+        st.session_state['embedding_image'] = user_image
+        st.session_state['user_embedding'] = embed_pil(user_image)
+    catalog = get_style_catalog()
+    return [catalog.get(style_id) for style_id in get_style_index().nearest(st.session_state['user_embedding'])]
+
+# Miniatura de um estilo do catálogo; o hash do arquivo é a versão no cache,
+# então nenhuma renderização consulta o disco
+def get_style_thumbnail(style):
+    return get_thumbnail(style['thumbnail_path'], STANDARD_IMAGE_SIZE, style['sha256'])
+
+# Miniatura de um estilo em memória, usada como alvo do face swap
+@st.cache_resource
+def get_style_payload(style_id):
+    style = get_style_catalog().get(style_id)
+    return ImagePayload(jpeg=get_thumbnail(style['path'], STANDARD_IMAGE_SIZE, style['sha256']))
+
+# Arquivo com a miniatura de um estilo, gravado uma única vez por processo
+# e compartilhado entre as sessões
+def get_style_target_path(style_id):
+    return get_style_payload(style_id).path(get_shared_temp_session())
+
+# Avança ou volta uma página da galeria de uma categoria
+def change_gallery_page(page_key, step, total_pages):
+    st.session_state[page_key] = min(total_pages - 1, max(0, st.session_state[page_key] + step))
+
+# Renderiza somente a página atual de uma lista de estilos da galeria
+# (uma categoria ou o resultado de uma busca).
+# Como fragmento, a navegação entre páginas reexecuta só este trecho.
+@st.fragment
+def render_gallery_page(page_name, styles):
+    with timer("gallery_render_seconds"):
+        draw_gallery_page(page_name, styles)
+
+def draw_gallery_page(page_name, styles):
+    page_key = f'style_page_{page_name}'
+
+    # Inicializar índice da página atual no session_state para cada categoria
+    if page_key not in st.session_state:
+        st.session_state[page_key] = 0
+
+    total_styles = len(styles)
+    total_pages = (total_styles + STYLES_PER_PAGE - 1) // STYLES_PER_PAGE
+
+    # Botões de navegação
+    if total_pages > 1:
+        col_nav1, col_nav2, col_nav3 = st.columns([1, 1, 3])
+        with col_nav1:
+            # A troca de página acontece no callback, antes do fragmento ser reexecutado
+            st.button("⬅️ Anterior", key=f"prev_{page_name}",
+                      disabled=st.session_state[page_key] == 0,
+                      on_click=change_gallery_page, args=(page_key, -1, total_pages))
+        with col_nav2:
+            st.button("Próximo ➡️", key=f"next_{page_name}",
+                      disabled=st.session_state[page_key] >= total_pages - 1,
+                      on_click=change_gallery_page, args=(page_key, 1, total_pages))
+        with col_nav3:
+            st.write(f"Página {st.session_state[page_key] + 1} de {total_pages}")
+
+    # Calcular os índices dos estilos a serem exibidos (a lista pode ter encolhido numa nova busca)
+    st.session_state[page_key] = min(st.session_state[page_key], max(0, total_pages - 1))
+    start_idx = st.session_state[page_key] * STYLES_PER_PAGE
+    end_idx = min(start_idx + STYLES_PER_PAGE, total_styles)
+    # Estilos visíveis, usados pelo pré-processamento especulativo
+    st.session_state['gallery_page_ids'] = [style['id'] for style in styles[start_idx:end_idx]]
+
+    # Exibir estilos em grid 3x2
+    for row in range(2):  # 2 linhas
+        cols = st.columns(3)  # 3 colunas
+        for col_idx in range(3):  # Para cada coluna
+            style_idx = start_idx + (row * 3) + col_idx
+            if style_idx < end_idx:
+                style = styles[style_idx]
+
+                # Os arquivos do catálogo já foram validados ao carregar
+                with cols[col_idx]:
+                    # Miniatura já redimensionada, vinda do cache do processo
+                    thumb = get_style_thumbnail(style)
+
+                    st.markdown('<div class="image-container">', unsafe_allow_html=True)
+                    st.image(thumb, caption=style['name'], use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                    # Botão para selecionar o estilo
+                    if st.button(f"Selecionar {style['name']}", key=f"style_{page_name}_{style['id']}"):
+                        st.session_state['selected_style'] = {
+                            'id': style['id'],
+                            'name': style['name'],
+                            'image': thumb,
+                            'category': style['category']
+                        }
+                        st.success(f"Estilo '{style['name']}' selecionado!")
+                        st.rerun()
+
+setup_metrics()
+metrics.inc("script_runs_total")
 
 # Header
 st.title("✂️ Barbearia Virtual - Face Swap")
@@ -189,6 +394,8 @@ with col1:
     # Limpar imagem quando mudar de modo
     if option != st.session_state['photo_mode']:
         st.session_state['uploaded_image'] = None
+        st.session_state['uploaded_file_id'] = None
+        st.session_state['upload_fingerprint'] = None
         st.session_state['camera_image'] = None
         st.session_state['photo_mode'] = option
     
@@ -196,18 +403,31 @@ with col1:
         uploaded_file = st.file_uploader("Envie uma foto sua de frente", type=["jpg", "jpeg", "png"])
         
         if uploaded_file is not None:
-            # Carregar a imagem e redimensionar
-            user_image = Image.open(uploaded_file)
-            user_image = resize_image(user_image, STANDARD_IMAGE_SIZE)
-            
-            # Salvar em session state
-            st.session_state['uploaded_image'] = user_image
-            st.session_state['camera_image'] = None  # Limpar imagem da câmera
+            # Processar só quando chega um novo upload; o mesmo conteúdo
+            # (mesma impressão digital) reaproveita a foto já normalizada
+            if st.session_state.get('uploaded_file_id') != uploaded_file.file_id:
+                st.session_state['uploaded_file_id'] = uploaded_file.file_id
+                data = uploaded_file.getvalue()
+                fingerprint = upload_fingerprint(data)
+                if fingerprint != st.session_state.get('upload_fingerprint'):
+                    st.session_state['upload_fingerprint'] = fingerprint
+                    st.session_state['upload_error'] = None
+                    try:
+                        # Decodificação reduzida e depois orientação, rosto alinhado e recortado, tamanho e cores
+                        st.session_state['uploaded_image'] = prepare_source(decode_upload(data), STANDARD_IMAGE_SIZE)
+                    except InvalidImageError as e:
+                        st.session_state['uploaded_image'] = None
+                        st.session_state['upload_error'] = str(e)
+                st.session_state['camera_image'] = None  # Limpar imagem da câmera
+            user_image = st.session_state['uploaded_image']
             
-            # Exibir a imagem
-            st.markdown('<div class="image-container">', unsafe_allow_html=True)
-            st.image(user_image, use_container_width=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+            if st.session_state.get('upload_error'):
+                st.error(st.session_state['upload_error'])
+            elif user_image is not None:
+                # Exibir a imagem
+                st.markdown('<div class="image-container">', unsafe_allow_html=True)
+                st.image(user_image, use_container_width=True)
+                st.markdown('</div>', unsafe_allow_html=True)
     
     else:  # Usar câmera
         st.write("Posicione seu rosto no centro da câmera")
@@ -216,7 +436,7 @@ with col1:
         webrtc_ctx = webrtc_streamer(
             key="camera_snapshot",
             video_processor_factory=VideoProcessor,
-            media_stream_constraints={"video": True, "audio": False},
+            media_stream_constraints={"video": {"frameRate": {"ideal": TARGET_FPS}}, "audio": False},
             async_processing=True,
             rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]}
         )
@@ -227,15 +447,23 @@ with col1:
         with col_btn1:
             # Botão para tirar foto
             if st.button("📸 Tirar Foto", key="take_photo"):
-                if webrtc_ctx.video_processor and webrtc_ctx.video_processor.current_frame is not None:
-                    # Capturar o frame atual
-                    current_frame = webrtc_ctx.video_processor.current_frame.copy()
-                    # Redimensionar e converter para PIL Image
-                    snap_pil = resize_image(current_frame, STANDARD_IMAGE_SIZE)
+                # Melhor frame dos últimos instantes, já avaliado quanto à qualidade
+                snapshot, quality = None, None
+                if webrtc_ctx.video_processor:
+                    snapshot, quality = webrtc_ctx.video_processor.get_snapshot()
+                if snapshot is not None:
+                    # Alinhar e recortar o rosto do frame capturado (já convertido para PIL Image)
+                    snap_pil = prepare_source(snapshot, STANDARD_IMAGE_SIZE)
                     st.session_state['camera_image'] = snap_pil
                     st.session_state['uploaded_image'] = None  # Limpar upload
+                    st.session_state['uploaded_file_id'] = None
+                    st.session_state['upload_fingerprint'] = None
                     st.success("Foto capturada com sucesso!")
                     st.rerun()
+                elif quality is not None and not quality['face']:
+                    st.warning("Nenhum rosto detectado. Posicione seu rosto no centro da câmera e tente novamente.")
+                elif quality is not None:
+                    st.warning("A imagem está tremida, escura ou com o rosto fora do centro. Fique parado, de frente para a câmera, e tente novamente.")
                 else:
                     st.warning("Câmera não está ativa ou não há frame disponível. Aguarde um momento e tente novamente.")
         
@@ -256,6 +484,9 @@ with col1:
         # Mostrar status da câmera
         if webrtc_ctx.state.playing:
             st.success("📹 Câmera ativa - Pronto para tirar foto")
+            if webrtc_ctx.video_processor:
+                stats = webrtc_ctx.video_processor.stats.summary()
+                st.caption(f"Processamento por frame: {stats['mean_ms']:.1f} ms (p95 {stats['p95_ms']:.1f} ms)")
         else:
             st.info("📷 Clique em 'START' para iniciar a câmera")
 
@@ -263,138 +494,46 @@ with col2:
     st.markdown("### 💇 Estilos de Corte Disponíveis")
     st.write("Navegue pelos estilos disponíveis:")
 
-    # Diretório onde as imagens dos estilos estão armazenadas
-    STYLES_DIR = "styles"  # Altere para o caminho do seu diretório
-
-    # Dicionário de estilos organizados por categoria
-    style_categories = {
-        "Clássicos": {
-            "Corte Side Part": "1.jpg",
-            "Americano 1": "18.jpg",
-            "Americano 2": "38.jpg",
-            "Buzzcut 1": "14.jpg",
-            "Buzzcut 2": "34.jpg",
-            "Corte Militar 1": "3.jpg",
-            "Classic Taper 1": "16.jpg",
-            "Classic Taper 2": "36.jpg",
-            "Caesar": "21.jpg",
-            "Under Slicked-Back": "25.jpg",
-            "Corte Militar 2": "6.jpg"
-        },
-        "Modernos": {
-            "Corte Undercut 1": "2.jpg",
-            "Corte Undercut 2": "10.jpg",
-            "Corte Undercut 3": "30.jpg",
-            "Old Money 1": "17.jpg",
-            "Old Money 2": "37.jpg",
-            "Pompadour 1": "11.jpg",
-            "Pompadour 2": "31.jpg",
-            "Surfista 1": "12.jpg",
-            "Repicado": "22.jpg",
-            "Surfista 2": "32.jpg",
-            "Topete 1": "24.jpg",
-            "Razor Part 1": "13.jpg",
-            "Corte com Risco": "41.jpg",
-            "Razor Part 2": "33.jpg",
-            "Taper 1": "20.jpg",
-            "Taper 2": "40.jpg",
-            "Corte Degradê 1": "4.jpg",
-            "Mid fade": "26.jpg",
-            "Low fade 1": "27.jpg",
-            "Low fade 2": "42.jpg",
-            "Corte Degradê 2": "7.jpg"
-        },
-        "Longos": {
-            "Topete 2": "8.jpg",
-            "Mullet 1": "15.jpg",
-            "Mullet 2": "35.jpg",
-            "Topete 3": "9.jpg"
-        },
-        "Ousados": {
-            "Quadrado ou Flat Top": "23.jpg",
-            "Corte Raspado": "5.jpg",
-            "Corte do Jaca": "28.jpg",
-            "Fluffy Edgar 1": "29.jpg",
-            "Fluffy Edgar 2": "43.jpg",
-            "V 1": "39.jpg",
-            "V 2": "19.jpg"
-        }
-    }
-
-    # Criar abas para cada categoria
-    tabs = st.tabs(list(style_categories.keys()))
-
-    for tab, (category_name, styles) in zip(tabs, style_categories.items()):
-        with tab:
-            # Inicializar índice da página atual no session_state para cada categoria
-            if f'style_page_{category_name}' not in st.session_state:
-                st.session_state[f'style_page_{category_name}'] = 0
-
-            # Número de estilos por página (3 colunas x 2 linhas = 6)
-            STYLES_PER_PAGE = 6
-
-            # Verificar se o diretório existe
-            if not os.path.exists(STYLES_DIR):
-                os.makedirs(STYLES_DIR)
-                st.warning(f"Diretório '{STYLES_DIR}' criado. Por favor, adicione as imagens dos estilos.")
+    try:
+        catalog = get_style_catalog()
+    except CatalogError as e:
+        catalog = None
+        st.error(f"{e}. Verifique o diretório '{STYLES_DIR}'.")
+
+    if catalog is not None:
+        st.toggle("⚡ Adiantar o face swap enquanto navego", value=PREFETCH_ENABLED, key="prefetch_enabled",
+                  help="Com foto e estilo escolhidos, o swap do estilo selecionado e dos próximos da página "
+                       "começa em segundo plano, para o resultado sair na hora.")
+
+        # Busca por nome, categoria ou tag (ex.: "degradê", "topete")
+        query = st.text_input("🔍 Buscar estilo", key="style_query", placeholder="Nome ou característica do corte")
+
+        if query.strip():
+            results = catalog.search(query)
+            if results:
+                render_gallery_page("busca", results)
             else:
-                # Lista de estilos para navegação
-                style_list = list(styles.items())
-                total_styles = len(style_list)
-                total_pages = (total_styles + STYLES_PER_PAGE - 1) // STYLES_PER_PAGE
-
-                # Botões de navegação
-                if total_pages > 1:
-                    col_nav1, col_nav2, col_nav3 = st.columns([1, 1, 3])
-                    with col_nav1:
-                        if st.button("⬅️ Anterior", key=f"prev_{category_name}", 
-                                   disabled=st.session_state[f'style_page_{category_name}'] == 0):
-                            st.session_state[f'style_page_{category_name}'] = max(0, st.session_state[f'style_page_{category_name}'] - 1)
-                            st.rerun()
-                    with col_nav2:
-                        if st.button("Próximo ➡️", key=f"next_{category_name}", 
-                                   disabled=st.session_state[f'style_page_{category_name}'] >= total_pages - 1):
-                            st.session_state[f'style_page_{category_name}'] = min(total_pages - 1, st.session_state[f'style_page_{category_name}'] + 1)
-                            st.rerun()
-                    with col_nav3:
-                        st.write(f"Página {st.session_state[f'style_page_{category_name}'] + 1} de {total_pages}")
-
-                # Calcular os índices dos estilos a serem exibidos
-                start_idx = st.session_state[f'style_page_{category_name}'] * STYLES_PER_PAGE
-                end_idx = min(start_idx + STYLES_PER_PAGE, total_styles)
-
-                # Exibir estilos em grid 3x2
-                for row in range(2):  # 2 linhas
-                    cols = st.columns(3)  # 3 colunas
-                    for col_idx in range(3):  # Para cada coluna
-                        style_idx = start_idx + (row * 3) + col_idx
-                        if style_idx < end_idx:
-                            style_name, style_file = style_list[style_idx]
-                            style_path = os.path.join(STYLES_DIR, style_file)
-
-                            # Verificar se o arquivo existe
-                            if os.path.exists(style_path):
-                                with cols[col_idx]:
-                                    img = Image.open(style_path)
-                                    # Redimensionar o estilo para exibição na galeria
-                                    img = resize_image(img, STANDARD_IMAGE_SIZE)
-
-                                    st.markdown('<div class="image-container">', unsafe_allow_html=True)
-                                    st.image(img, caption=style_name, use_container_width=True)
-                                    st.markdown('</div>', unsafe_allow_html=True)
-
-                                    # Botão para selecionar o estilo
-                                    if st.button(f"Selecionar {style_name}", key=f"style_{category_name}_{style_idx}"):
-                                        # Salvar temporariamente a imagem selecionada
-                                        temp_style_path = save_temp_image(img)
-                                        st.session_state['selected_style'] = {
-                                            'name': style_name,
-                                            'path': temp_style_path,
-                                            'image': img,
-                                            'category': category_name
-                                        }
-                                        st.success(f"Estilo '{style_name}' selecionado!")
-                                        st.rerun()
+                st.info("Nenhum estilo encontrado para essa busca.")
+        else:
+            # Com uma foto, os estilos recomendados aparecem primeiro
+            categories = catalog.categories
+            photo = st.session_state.get('uploaded_image') or st.session_state.get('camera_image')
+            recommended = get_recommended_styles(photo) if photo is not None else []
+            if recommended:
+                categories = [RECOMMENDED_CATEGORY] + categories
+
+            # Apenas a categoria escolhida é renderizada; as demais não custam nada
+            category_name = st.radio(
+                "Categoria",
+                categories,
+                horizontal=True,
+                key="style_category",
+                label_visibility="collapsed"
+            )
+            if category_name == RECOMMENDED_CATEGORY:
+                render_gallery_page(category_name, recommended)
+            else:
+                render_gallery_page(category_name, catalog.in_category(category_name))
 
 # Seção para processar e exibir o resultado
 st.markdown("---")
@@ -402,12 +541,8 @@ st.markdown("### 🪄 Visualização do Resultado")
 
 # Verificar se o usuário selecionou uma foto e um estilo
 user_image = st.session_state.get('uploaded_image') or st.session_state.get('camera_image')
-source_path = None
 
 if user_image is not None and st.session_state.get('selected_style') is not None:
-    # Preparar a imagem do usuário
-    source_path = save_temp_image(user_image)
-    
     # Exibir imagens lado a lado
     col1, col2 = st.columns(2)
     
@@ -423,56 +558,53 @@ if user_image is not None and st.session_state.get('selected_style') is not None
         st.image(st.session_state['selected_style']['image'], use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
-    # Botão para processar o face swap
-    if st.button("✨ Aplicar Face Swap") and not st.session_state['processing']:
-        st.session_state['processing'] = True
-        
-        with st.spinner("Processando o face swap... Isso pode levar alguns segundos."):
-            try:
-                result_img = face_swap(
-                    source_path=source_path,
-                    target_path=st.session_state['selected_style']['path']
-                )
-                
-                if result_img:
-                    # Redimensionar o resultado
-                    result_img = resize_image(result_img, STANDARD_IMAGE_SIZE)
-                    st.session_state['result_image'] = result_img
-                    
-                    # Salvar o resultado em um arquivo temporário para download
-                    result_path = save_temp_image(result_img)
-                    
-                    # Exibir o resultado
-                    st.success("Face swap concluído com sucesso!")
-                    
-                    # Converter para base64 para exibição
-                    buffered = BytesIO()
-                    result_img.save(buffered, format="JPEG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode()
-                    
-                    # Exibir o resultado com HTML para melhor apresentação
-                    st.markdown(f"""
-                    <div class="result-container">
-                        <h3 style="text-align: center;">🎉 Seu Novo Visual!</h3>
-                        <div class="image-container">
-                            <img src="data:image/jpeg;base64,{img_str}">
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Botão para download
-                    with open(result_path, "rb") as file:
-                        btn = st.download_button(
-                            label="⬇️ Baixar Imagem",
-                            data=file,
-                            file_name=f"novo_visual_{uuid.uuid4().hex[:8]}.jpg",
-                            mime="image/jpeg"
-                        )
-            
-            except Exception as e:
-                st.error(f"Ocorreu um erro durante o processamento: {str(e)}")
-        
-        st.session_state['processing'] = False
+    # Botão para processar o face swap: o job vai para a fila e a tela acompanha o andamento
+    if st.button("✨ Aplicar Face Swap", disabled=st.session_state['swap_job'] is not None):
+        if st.session_state.get('prefetcher') is not None:
+            st.session_state['prefetcher'].mark_used(st.session_state['selected_style']['id'])
+        try:
+            st.session_state['swap_job'] = submit_face_swap(
+                get_source_payload(user_image),
+                st.session_state['selected_style']
+            )
+        except QueueFullError as e:
+            st.warning(str(e))
+        except CircuitOpenError as e:
+            # Falha na hora em vez de deixar o usuário esperando um backend fora do ar
+            st.warning(backend_unavailable_message(e))
+
+    if st.session_state['swap_job'] is not None:
+        show_swap_progress()
+
+    # Com o modo ativo, os prováveis próximos swaps já vão para a fila (e o resultado para o cache)
+    if st.session_state.get('prefetch_enabled'):
+        update_prefetch(user_image)
+        if get_prefetcher().active:
+            run_prefetch()
+    elif st.session_state.get('prefetcher') is not None:
+        st.session_state['prefetcher'].cancel()
+
+    if st.session_state.get('swap_error'):
+        st.error(st.session_state.pop('swap_error'))
+
+    if st.session_state['new_result']:
+        st.session_state['new_result'] = False
+        result_bytes = st.session_state['result_bytes']
+
+        # Exibir o resultado
+        st.success("Face swap concluído com sucesso!")
+
+        with st.container(key="result_container"):
+            st.markdown('<h3 style="text-align: center;">🎉 Seu Novo Visual!</h3>', unsafe_allow_html=True)
+            st.image(result_bytes, use_container_width=True)
+
+        # Botão para download, com os mesmos bytes já codificados
+        btn = st.download_button(
+            label="⬇️ Baixar Imagem",
+            data=result_bytes,
+            file_name=f"novo_visual_{uuid.uuid4().hex[:8]}.jpg",
+            mime="image/jpeg"
+        )
 
 else:
     if user_image is None:
@@ -480,10 +612,55 @@ else:
     elif st.session_state.get('selected_style') is None:
         st.info("👆 Agora, selecione um estilo de corte da galeria acima.")
 
+# Modo de comparação: aplicar vários estilos à mesma foto de uma vez
+if user_image is not None and catalog is not None:
+    st.markdown("---")
+    st.markdown("### 🧪 Comparar Estilos")
+
+    with st.expander("Experimentar vários cortes de uma vez", expanded=st.session_state['batch'] is not None):
+        batch_category = st.selectbox("Categoria", catalog.categories, key="batch_category")
+        category_styles = {style['id']: style for style in catalog.in_category(batch_category)}
+        batch_ids = st.multiselect(
+            "Estilos (deixe vazio para usar a categoria inteira)",
+            list(category_styles),
+            format_func=lambda style_id: category_styles[style_id]['name'],
+            key=f"batch_styles_{batch_category}"
+        )
+        batch_parallelism = st.slider("Swaps simultâneos", 1, BATCH_MAX_PARALLELISM,
+                                      min(2, BATCH_MAX_PARALLELISM), key="batch_parallelism")
+
+        batch_running = st.session_state['batch'] is not None and not st.session_state['batch'].done
+        if st.button("🚀 Comparar estilos", disabled=batch_running):
+            styles = [category_styles[style_id] for style_id in batch_ids] or list(category_styles.values())
+            source_payload = get_source_payload(user_image)
+            st.session_state['batch'] = BatchSwap(
+                get_job_queue(),
+                get_backend(),
+                get_result_cache(),
+                source_payload.path(get_temp_session()),  # A foto é gravada uma única vez para o lote inteiro
+                source_payload.digest,
+                [
+                    {
+                        'id': style['id'],
+                        'name': style['name'],
+                        'path': get_style_target_path(style['id'])
+                    }
+                    for style in styles
+                ],
+                parallelism=batch_parallelism
+            )
+            batch_running = True
+
+        if st.session_state['batch'] is not None:
+            if batch_running:
+                show_batch_progress()
+            else:
+                render_batch_grid(st.session_state['batch'])
+
 # Exibir resultado anterior se existir
-if st.session_state.get('result_image') is not None:
+if st.session_state.get('result_bytes') is not None:
     st.markdown("### 🎨 Último Resultado")
-    st.image(st.session_state['result_image'], use_container_width=True)
+    st.image(st.session_state['result_bytes'], use_container_width=True)
 
 # Rodapé
 st.markdown("---")
@@ -495,16 +672,4 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Limpar arquivos temporários ao final
-def cleanup():
-    if st.session_state.get('uploaded_image'):
-        if hasattr(st.session_state['uploaded_image'], 'name') and os.path.exists(st.session_state['uploaded_image'].name):
-            os.unlink(st.session_state['uploaded_image'].name)
-    
-    if st.session_state.get('selected_style') and 'path' in st.session_state['selected_style']:
-        if os.path.exists(st.session_state['selected_style']['path']):
-            os.unlink(st.session_state['selected_style']['path'])
-
-# Registrar função de limpeza para ser executada quando o app for fechado
-import atexit
-atexit.register(cleanup)
\ No newline at end of file
+metrics.observe("script_run_seconds", time.perf_counter() - script_started_at)
@@ -0,0 +1,73 @@
+from backends import face_swap
+from result_cache import result_key
+from job_queue import QueueFullError, DONE, ERROR, CANCELLED
+
+# Face swap da mesma foto com vários estilos, limitado a `parallelism`
+# jobs simultâneos. A foto é gravada uma única vez (source_path) e o hash
+# dos pixels é calculado uma vez só para todas as chaves de cache.
+class BatchSwap:
+    def __init__(self, job_queue, backend, result_cache, source_path, source_digest, styles, parallelism=2):
+        self.job_queue = job_queue
+        self.backend = backend
+        self.result_cache = result_cache
+        self.source_path = source_path
+        self.source_digest = source_digest
+        self.styles = list(styles)
+        self.parallelism = max(1, parallelism)
+        self.pending = list(self.styles)
+        self.jobs = {}
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def done(self):
+        return not self.pending and not self.jobs
+
+    # Coleta os jobs concluídos e enfileira os próximos estilos até o limite
+    def step(self):
+        for style_id, job_id in list(self.jobs.items()):
+            status = self.job_queue.status(job_id)
+            if status is None:
+                self.errors[style_id] = "Job expirado"
+            elif status['status'] == DONE:
+                self.results[style_id] = status['result']
+            elif status['status'] == ERROR:
+                self.errors[style_id] = str(status['error'])
+            elif status['status'] == CANCELLED:
+                self.errors[style_id] = "Cancelado"
+            else:
+                continue
+            del self.jobs[style_id]
+
+        while self.pending and len(self.jobs) < self.parallelism:
+            style = self.pending[0]
+            cache_key = result_key(self.source_digest, style['id'], backend=self.backend.name)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.results[style['id']] = cached
+                self.pending.pop(0)
+                continue
+            try:
+                self.jobs[style['id']] = self.job_queue.submit(
+                    face_swap,
+                    self.backend,
+                    self.result_cache,
+                    self.source_path,
+                    style['path'],
+                    cache_key=cache_key,
+                    key=cache_key
+                )
+            except QueueFullError:
+                # Fila global cheia: tenta de novo no próximo passo
+                break
+            self.pending.pop(0)
+
+    # Desiste dos estilos que ainda não começaram
+    def cancel(self):
+        for style in self.pending:
+            self.errors[style['id']] = "Cancelado"
+        self.pending = []
+        for style_id, job_id in list(self.jobs.items()):
+            if self.job_queue.cancel(job_id):
+                self.errors[style_id] = "Cancelado"
+                del self.jobs[style_id]
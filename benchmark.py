@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import tracemalloc
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from metrics import Histogram
+from preprocessing import SOURCE_SIZE
+
+# Benchmarks e teste de carga offline dos caminhos críticos do app.
+# Tudo roda contra o backend falso (stub), sem rede:
+#   python benchmark.py                       # todas as suítes
+#   python benchmark.py swap load --sessions 8 --latency 0.5 --json resultado.json
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(ROOT, "barbearia.py")
+
+# Foto de exemplo (com rosto) usada como entrada sintética
+SAMPLE_PHOTO = os.path.join(ROOT, "1.jpg")
+
+# Tamanhos das fotos grandes usadas no teste de upload (câmeras de celular)
+UPLOAD_SIZES = ((2000, 1500), (4000, 3000), (6000, 4000))
+
+# Resolução dos frames sintéticos da webcam
+WEBCAM_SIZE = (640, 480)
+
+# Tempo máximo de uma sessão do teste de carga esperando o resultado, em segundos
+LOAD_SWAP_TIMEOUT = float(os.environ.get("LOAD_SWAP_TIMEOUT", "120"))
+
+# O streamlit.testing cria um Runtime global a cada execução do script, então
+# as execuções das sessões simuladas são serializadas; os swaps continuam
+# concorrendo entre si na fila compartilhada, como no servidor
+_app_lock = threading.Lock()
+
+SUITES = ("gallery", "resize", "upload", "webcam", "swap", "load")
+
+# Percentis (ms) de uma lista de durações em segundos
+def summarize(durations):
+    histogram = Histogram(window=max(1, len(durations)))
+    for duration in durations:
+        histogram.observe(duration)
+    return {name: round(value, 2) for name, value in histogram.summary().items()}
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def _sample_photo(size=None, seed=0):
+    image = Image.open(SAMPLE_PHOTO).convert("RGB")
+    if size is not None:
+        image = image.resize(size, Image.Resampling.BICUBIC)
+    # Um pixel diferente por sessão: cada foto gera uma chave de cache própria
+    if seed:
+        image.putpixel((0, 0), (seed % 256, (seed // 256) % 256, 0))
+    return image
+
+# Sessão headless do app (streamlit.testing), com a foto do usuário já definida
+def _app_session(photo):
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP_FILE, default_timeout=LOAD_SWAP_TIMEOUT)
+    with _app_lock:
+        app.run()
+        app.session_state["uploaded_image"] = photo
+        app.run()
+    return app
+
+def _check_app(app):
+    if app.exception:
+        raise RuntimeError(f"Erro no app: {app.exception[0].value}")
+
+# Renderização da galeria: primeira exibição de cada categoria (miniaturas
+# ainda frias) e custo de um rerun sem mudanças com a categoria aberta
+def bench_gallery(reruns=10):
+    from image_utils import resize_image
+    app = _app_session(resize_image(_sample_photo(), SOURCE_SIZE))
+    results = {}
+    for category in app.radio(key="style_category").options:
+        first, _ = _timed(app.radio(key="style_category").set_value(category).run)
+        _check_app(app)
+        durations = [_timed(app.run)[0] for _ in range(reruns)]
+        results[category] = {"first_ms": round(1000 * first, 2), "rerun": summarize(durations)}
+    return results
+
+# resize_image sobre todas as imagens reais de styles/
+def bench_resize(repeat=3):
+    from catalog import load_catalog, CATALOG_FILE
+    from image_utils import resize_image
+    catalog = load_catalog(os.path.join(ROOT, CATALOG_FILE))
+    images = [Image.open(style["path"]).convert("RGB") for style in catalog.styles]
+    durations = []
+    for _ in range(repeat):
+        for image in images:
+            durations.append(_timed(resize_image, image.copy(), SOURCE_SIZE)[0])
+    return {"images": len(images), **summarize(durations)}
+
+# Normalização do upload (decodificação reduzida + recorte do rosto) em fotos grandes
+def bench_upload(repeat=3, sizes=UPLOAD_SIZES):
+    from image_utils import decode_upload
+    from preprocessing import prepare_source
+    results = {}
+    for size in sizes:
+        photo = _sample_photo(size)
+        for image_format in ("JPEG", "PNG"):
+            buffer = BytesIO()
+            photo.save(buffer, format=image_format)
+            data = buffer.getvalue()
+            durations = [
+                _timed(lambda: prepare_source(decode_upload(data), SOURCE_SIZE))[0]
+                for _ in range(repeat)
+            ]
+            results[f"{size[0]}x{size[1]} {image_format}"] = {
+                "bytes": len(data),
+                **summarize(durations)
+            }
+    return results
+
+# Vazão do VideoProcessor.recv com frames sintéticos (yuv420p como no WebRTC, e bgr24)
+def bench_webcam(frames=120, size=WEBCAM_SIZE):
+    import av
+    import numpy as np
+    from video_processor import VideoProcessor
+    rgb = np.asarray(_sample_photo(size))
+    results = {}
+    for frame_format in ("yuv420p", "bgr24"):
+        frame = av.VideoFrame.from_ndarray(rgb, format="rgb24").reformat(format=frame_format)
+        processor = VideoProcessor()
+        durations = [_timed(processor.recv, frame)[0] for _ in range(frames)]
+        processor.on_ended()
+        results[frame_format] = {"fps": round(len(durations) / sum(durations), 1), **summarize(durations)}
+    return results
+
+# Swaps de ponta a ponta (fila + pool de clientes + backend resiliente) contra
+# o cliente falso com latência configurável; cada pedido usa uma chave nova,
+# então nenhum resultado vem do cache
+def bench_swap(requests=16, concurrency=4, latency=0.5, workers=None, pool_size=None):
+    from backends import ClientPool, RemoteBackend, ResilientBackend, StubClient, face_swap
+    from catalog import load_catalog, CATALOG_FILE
+    from job_queue import JobQueue, JOB_WORKERS, DONE, ERROR, CANCELLED
+    from result_cache import ResultCache
+    workers = workers or JOB_WORKERS
+    pool = ClientPool(lambda: StubClient(latency=latency), size=pool_size or workers)
+    backend = ResilientBackend(RemoteBackend(pool, name="stub"))
+    job_queue = JobQueue(workers=workers, max_queued=max(requests, 1))
+    result_cache = ResultCache(cache_dir="")
+    styles = load_catalog(os.path.join(ROOT, CATALOG_FILE)).styles
+
+    def request(i):
+        start = time.perf_counter()
+        job_id = job_queue.submit(
+            face_swap, backend, result_cache, SAMPLE_PHOTO, styles[i % len(styles)]["path"],
+            cache_key=f"bench-{i}", key=f"bench-{i}"
+        )
+        while True:
+            status = job_queue.status(job_id)
+            if status["status"] in (DONE, ERROR, CANCELLED):
+                break
+            time.sleep(0.005)
+        if status["status"] != DONE:
+            raise RuntimeError(f"Swap {i} terminou com {status['status']}: {status['error']}")
+        return time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            durations = list(executor.map(request, range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        backend.close()
+    return {
+        "workers": workers,
+        "latency_s": latency,
+        "throughput_per_s": round(requests / elapsed, 2),
+        **summarize(durations)
+    }
+
+# Uma sessão completa: abre o app com a foto, escolhe um estilo, aplica e espera o resultado.
+# Retorna a duração de cada rerun e o tempo até o resultado aparecer.
+def _load_session(index, photo):
+    run_durations = []
+
+    def run(app):
+        with _app_lock:
+            duration, _ = _timed(app.run)
+        run_durations.append(duration)
+        _check_app(app)
+
+    app = _app_session(photo)
+    buttons = [button for button in app.button if button.label.startswith("Selecionar")]
+    buttons[index % len(buttons)].click()
+    run(app)
+
+    start = time.perf_counter()
+    [button for button in app.button if "Aplicar" in button.label][0].click()
+    run(app)
+    while app.session_state["swap_job"] is not None:
+        if time.perf_counter() - start > LOAD_SWAP_TIMEOUT:
+            raise TimeoutError(f"Sessão {index} sem resultado após {LOAD_SWAP_TIMEOUT:.0f}s")
+        time.sleep(0.1)
+        run(app)
+    if app.session_state["result_bytes"] is None:
+        raise RuntimeError(f"Sessão {index} sem resultado: {app.session_state['swap_error']}")
+    return app, run_durations, time.perf_counter() - start
+
+# Várias sessões simultâneas do app, sem navegador; mede reruns, tempo até o
+# resultado e memória Python alocada por sessão (tracemalloc) e o pico do processo.
+# Com o tracemalloc ligado os tempos medidos aqui ficam um pouco mais altos.
+def bench_load(sessions=4):
+    from image_utils import resize_image
+    photos = [resize_image(_sample_photo(seed=i + 1), SOURCE_SIZE) for i in range(sessions)]
+
+    # Uma sessão antes da medição carrega catálogo, índice e caches do processo
+    _load_session(0, resize_image(_sample_photo(seed=sessions + 1), SOURCE_SIZE))
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as executor:
+            results = list(executor.map(_load_session, range(sessions), photos))
+        elapsed = time.perf_counter() - start
+        # As sessões (AppTest) ainda estão vivas em `results`
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    run_durations = [duration for _, durations, _ in results for duration in durations]
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "rerun": summarize(run_durations),
+        "time_to_result": summarize([duration for _, _, duration in results]),
+        "memory_per_session_kb": round((current - baseline) / sessions / 1024, 1),
+        "peak_traced_kb": round((peak - baseline) / 1024, 1),
+        # ru_maxrss é em KB no Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def _print_results(name, results, indent="  "):
+    print(f"{indent}{name}:" if indent else f"[{name}]")
+    for key, value in results.items():
+        if isinstance(value, dict):
+            _print_results(key, value, indent + "  ")
+        else:
+            print(f"{indent}  {key}: {value}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline do app (backend falso, sem rede)")
+    parser.add_argument("suites", nargs="*", choices=SUITES, help="suítes a rodar (padrão: todas)")
+    parser.add_argument("--repeat", type=int, default=3, help="repetições de resize/upload")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns medidos por categoria da galeria")
+    parser.add_argument("--frames", type=int, default=120, help="frames da webcam")
+    parser.add_argument("--requests", type=int, default=16, help="swaps da suíte swap")
+    parser.add_argument("--concurrency", type=int, default=4, help="pedidos de swap simultâneos")
+    parser.add_argument("--sessions", type=int, default=4, help="sessões simultâneas do teste de carga")
+    parser.add_argument("--latency", type=float, default=0.5, help="latência do backend falso, em segundos")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    # O app é carregado com o backend falso e sem cache de resultados em disco
+    os.environ["FACE_SWAP_BACKEND"] = "stub"
+    os.environ["FACE_SWAP_STUB_LATENCY"] = str(args.latency)
+    os.environ["RESULT_CACHE_DIR"] = ""
+    sys.path.insert(0, ROOT)
+    # O app usa caminhos relativos à raiz do repositório (styles/, caches)
+    os.chdir(ROOT)
+
+    suites = {
+        "gallery": lambda: bench_gallery(args.reruns),
+        "resize": lambda: bench_resize(args.repeat),
+        "upload": lambda: bench_upload(args.repeat),
+        "webcam": lambda: bench_webcam(args.frames),
+        "swap": lambda: bench_swap(args.requests, args.concurrency, args.latency),
+        "load": lambda: bench_load(args.sessions),
+    }
+    results = {}
+    for name in args.suites or SUITES:
+        results[name] = suites[name]()
+        _print_results(name, results[name], indent="")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import hashlib
+import unicodedata
+
+# Diretório das imagens dos estilos e manifesto do catálogo
+STYLES_DIR = os.environ.get("STYLES_DIR", "styles")
+CATALOG_FILE = os.environ.get("CATALOG_FILE", os.path.join(STYLES_DIR, "catalog.json"))
+
+# Campos obrigatórios de cada estilo no manifesto
+REQUIRED_FIELDS = ("id", "name", "category", "file", "sha256")
+
+class CatalogError(Exception):
+    pass
+
+# Texto normalizado para busca: minúsculo e sem acentos
+def normalize_text(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return text.lower()
+
+# Hash SHA-256 do conteúdo de um arquivo
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Catálogo de estilos em memória, com índices por id, categoria e tag.
+# Cada estilo é um dict com id, name, category, file, thumbnail, tags e sha256,
+# mais `path` e `thumbnail_path` já resolvidos; nenhuma consulta toca o disco.
+class StyleCatalog:
+    def __init__(self, categories, styles, styles_dir=STYLES_DIR):
+        self.styles_dir = styles_dir
+        self.categories = list(categories)
+        self.styles = []
+        self._by_id = {}
+        self._by_category = {category: [] for category in self.categories}
+        self._by_tag = {}
+        self._search_text = {}
+
+        for style in styles:
+            style = dict(style)
+            style.setdefault("thumbnail", style["file"])
+            style["tags"] = list(style.get("tags", []))
+            style["path"] = os.path.join(styles_dir, style["file"])
+            style["thumbnail_path"] = os.path.join(styles_dir, style["thumbnail"])
+
+            self.styles.append(style)
+            self._by_id[style["id"]] = style
+            self._by_category[style["category"]].append(style)
+            for tag in style["tags"]:
+                self._by_tag.setdefault(normalize_text(tag), []).append(style)
+            self._search_text[style["id"]] = normalize_text(
+                " ".join([style["name"], style["category"]] + style["tags"])
+            )
+
+    def __len__(self):
+        return len(self.styles)
+
+    def __contains__(self, style_id):
+        return style_id in self._by_id
+
+    def get(self, style_id):
+        return self._by_id.get(style_id)
+
+    def in_category(self, category):
+        return self._by_category.get(category, [])
+
+    def with_tag(self, tag):
+        return self._by_tag.get(normalize_text(tag), [])
+
+    @property
+    def tags(self):
+        return sorted(self._by_tag)
+
+    # Busca por texto (todas as palavras precisam aparecer no nome, categoria
+    # ou tags), opcionalmente filtrando por categoria e exigindo todas as tags
+    def search(self, query="", category=None, tags=()):
+        styles = self.in_category(category) if category else self.styles
+        for tag in tags:
+            tagged = {style["id"] for style in self.with_tag(tag)}
+            styles = [style for style in styles if style["id"] in tagged]
+        words = normalize_text(query).split()
+        if words:
+            styles = [
+                style for style in styles
+                if all(word in self._search_text[style["id"]] for word in words)
+            ]
+        return styles
+
+# Valida a estrutura do manifesto e a existência dos arquivos (uma vez, ao carregar)
+def validate_manifest(manifest, styles_dir=STYLES_DIR):
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("styles"), list):
+        raise CatalogError("Catálogo sem a lista de estilos")
+    categories = manifest.get("categories")
+    if not isinstance(categories, list) or not categories:
+        raise CatalogError("Catálogo sem a lista de categorias")
+
+    ids = set()
+    for index, style in enumerate(manifest["styles"]):
+        missing = [field for field in REQUIRED_FIELDS if not style.get(field)]
+        if missing:
+            raise CatalogError(f"Estilo #{index} sem os campos: {', '.join(missing)}")
+        if style["id"] in ids:
+            raise CatalogError(f"Id de estilo repetido: {style['id']}")
+        ids.add(style["id"])
+        if style["category"] not in categories:
+            raise CatalogError(f"Categoria desconhecida no estilo {style['id']}: {style['category']}")
+        if not isinstance(style.get("tags", []), list):
+            raise CatalogError(f"Tags do estilo {style['id']} devem ser uma lista")
+        for field in ("file", "thumbnail"):
+            name = style.get(field)
+            if name and not os.path.isfile(os.path.join(styles_dir, name)):
+                raise CatalogError(f"Arquivo do estilo {style['id']} não encontrado: {name}")
+
+# Carrega e valida o manifesto do catálogo
+def load_catalog(path=CATALOG_FILE, styles_dir=None):
+    styles_dir = styles_dir or os.path.dirname(path) or "."
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise CatalogError(f"Catálogo de estilos não encontrado: {path}")
+    except json.JSONDecodeError as e:
+        raise CatalogError(f"Catálogo de estilos inválido: {e}")
+    validate_manifest(manifest, styles_dir)
+    return StyleCatalog(manifest["categories"], manifest["styles"], styles_dir)
+
+# Recalcula os hashes dos arquivos no manifesto; retorna os ids alterados
+def refresh_hashes(path=CATALOG_FILE):
+    styles_dir = os.path.dirname(path) or "."
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    changed = []
+    for style in manifest["styles"]:
+        sha256 = file_sha256(os.path.join(styles_dir, style["file"]))
+        if style.get("sha256") != sha256:
+            style["sha256"] = sha256
+            changed.append(style["id"])
+    if changed:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    validate_manifest(manifest, styles_dir)
+    return changed
+
+# Atualiza os hashes e valida o catálogo: python catalog.py [caminho_do_catalogo]
+if __name__ == "__main__":
+    catalog_file = sys.argv[1] if len(sys.argv) > 1 else CATALOG_FILE
+    changed = refresh_hashes(catalog_file)
+    catalog = load_catalog(catalog_file)
+    print(f"{len(catalog)} estilos em {len(catalog.categories)} categorias ({len(changed)} hashes atualizados)")
@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+# Largura do frame usado na detecção (o frame é reduzido antes de detectar)
+DETECTION_WIDTH = int(os.environ.get("DETECTION_WIDTH", "320"))
+
+# A detecção roda a cada N frames; nos intermediários as caixas anteriores são reaproveitadas
+DETECTION_INTERVAL = int(os.environ.get("DETECTION_INTERVAL", "5"))
+
+# Taxa de quadros pedida à câmera
+TARGET_FPS = int(os.environ.get("TARGET_FPS", "15"))
+
+_face_cascade = None
+_face_cascade_lock = threading.Lock()
+_detect_lock = threading.Lock()
+
+# Classificador Haar carregado uma única vez por processo
+def get_face_cascade():
+    global _face_cascade
+    if _face_cascade is None:
+        with _face_cascade_lock:
+            if _face_cascade is None:
+                _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _face_cascade
+
+_eye_cascade = None
+_eye_cascade_lock = threading.Lock()
+_eye_detect_lock = threading.Lock()
+
+# Classificador de olhos, usado para alinhar o rosto; carregado uma única vez
+def get_eye_cascade():
+    global _eye_cascade
+    if _eye_cascade is None:
+        with _eye_cascade_lock:
+            if _eye_cascade is None:
+                _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    return _eye_cascade
+
+# Detecta olhos numa região em tons de cinza (normalmente o recorte do rosto)
+def detect_eyes(gray, scale_factor=1.1, min_neighbors=5):
+    cascade = get_eye_cascade()
+    with _eye_detect_lock:
+        eyes = cascade.detectMultiScale(gray, scale_factor, min_neighbors)
+    if len(eyes) == 0:
+        return []
+    return [tuple(int(v) for v in eye) for eye in np.asarray(eyes)]
+
+# Converte para tons de cinza e reduz para `width` pixels de largura.
+# Retorna o frame reduzido e o fator de escala para voltar ao tamanho original.
+def downscale_gray(img, width=DETECTION_WIDTH):
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    scale = 1.0
+    if width and gray.shape[1] > width:
+        scale = gray.shape[1] / width
+        gray = cv2.resize(gray, (width, int(round(gray.shape[0] / scale))), interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+# Detecta rostos num frame já em tons de cinza, sem redimensionar
+def _detect(gray, scale_factor=1.1, min_neighbors=4):
+    # O mesmo classificador é usado por todas as sessões da câmera
+    cascade = get_face_cascade()
+    with _detect_lock:
+        faces = cascade.detectMultiScale(gray, scale_factor, min_neighbors)
+    if len(faces) == 0:
+        return []
+    return [tuple(int(v) for v in face) for face in np.asarray(faces)]
+
+def _rescale(faces, scale):
+    return [tuple(int(round(v * scale)) for v in face) for face in faces]
+
+# Detecta rostos num frame BGR ou em tons de cinza, trabalhando numa cópia
+# reduzida para `width` pixels de largura. Retorna as caixas na escala original.
+def detect_faces(img, width=DETECTION_WIDTH, scale_factor=1.1, min_neighbors=4):
+    gray, scale = downscale_gray(img, width)
+    return _rescale(_detect(gray, scale_factor, min_neighbors), scale)
+
+_profile_cascade = None
+_profile_cascade_lock = threading.Lock()
+_profile_detect_lock = threading.Lock()
+
+# Classificador de rosto de perfil, carregado uma única vez por processo
+def get_profile_cascade():
+    global _profile_cascade
+    if _profile_cascade is None:
+        with _profile_cascade_lock:
+            if _profile_cascade is None:
+                _profile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_profileface.xml')
+    return _profile_cascade
+
+def _detect_profile(gray):
+    cascade = get_profile_cascade()
+    with _profile_detect_lock:
+        faces = cascade.detectMultiScale(gray, 1.1, 4)
+    return [tuple(int(v) for v in face) for face in faces] if len(faces) else []
+
+# Maior rosto da imagem: tenta de frente e depois de perfil (nos dois sentidos)
+def largest_face(img, width=DETECTION_WIDTH):
+    faces = detect_faces(img, width=width)
+    if not faces:
+        gray, scale = downscale_gray(img, width)
+        faces = _detect_profile(gray)
+        if not faces:
+            faces = [(gray.shape[1] - x - w, y, w, h) for (x, y, w, h) in _detect_profile(cv2.flip(gray, 1))]
+        faces = _rescale(faces, scale)
+    if not faces:
+        return None
+    return max(faces, key=lambda f: f[2] * f[3])
+
+# Região padrão do rosto nas fotos (de estilo) em que nenhum rosto é detectado
+def default_face_region(img):
+    height, width = img.shape[:2]
+    return (int(width * 0.2), int(height * 0.4), int(width * 0.6), int(height * 0.55))
+
+# Nitidez (variância do Laplaciano) que já conta como totalmente nítida
+SHARPNESS_REFERENCE = float(os.environ.get("SHARPNESS_REFERENCE", "120"))
+
+# Qualidade de um frame para a foto, de 0 a 1: rosto presente, centralizado
+# e de bom tamanho, nitidez do rosto e exposição (brilho médio perto do meio)
+def score_frame(gray, faces):
+    if not faces:
+        return {"score": 0.0, "face": False, "centered": 0.0, "sharpness": 0.0, "exposure": 0.0}
+
+    height, width = gray.shape[:2]
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    roi = gray[y:y + h, x:x + w]
+
+    # Distância do centro do rosto ao centro do frame, normalizada
+    offset = float(np.hypot((x + w / 2 - width / 2) / width, (y + h / 2 - height / 2) / height))
+    centered = max(0.0, 1.0 - 2.0 * offset)
+    size = min(1.0, w / (0.25 * width))
+    sharpness = min(1.0, float(cv2.Laplacian(roi, cv2.CV_64F).var()) / SHARPNESS_REFERENCE)
+    exposure = max(0.0, 1.0 - abs(float(roi.mean()) - 128.0) / 128.0)
+
+    return {
+        "score": centered * size * sharpness * exposure,
+        "face": True,
+        "centered": centered,
+        "sharpness": sharpness,
+        "exposure": exposure,
+    }
+
+# Detecção espaçada: roda a cada `interval` frames e mantém as últimas caixas.
+# Nos frames com detecção também calcula a qualidade (`quality`).
+class FaceTracker:
+    def __init__(self, interval=DETECTION_INTERVAL, width=DETECTION_WIDTH):
+        self.interval = max(1, interval)
+        self.width = width
+        self.frame_count = 0
+        self.faces = []
+        self.quality = None
+
+    # Retorna as caixas e se a detecção rodou neste frame
+    def update(self, img):
+        detected = self.frame_count % self.interval == 0
+        if detected:
+            gray, scale = downscale_gray(img, self.width)
+            faces = _detect(gray)
+            self.quality = score_frame(gray, faces)
+            self.faces = _rescale(faces, scale)
+        self.frame_count += 1
+        return self.faces, detected
+
+# Estatísticas de latência por frame (janela dos últimos `window` frames)
+class LatencyStats:
+    def __init__(self, window=120):
+        self.frames = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.frames += 1
+            self._samples.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            frames = self.frames
+        if not samples:
+            return {"frames": frames, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "frames": frames,
+            "mean_ms": 1000 * sum(samples) / len(samples),
+            "p95_ms": 1000 * samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max_ms": 1000 * samples[-1],
+        }
+
+    # Mede o tempo do bloco e registra como uma amostra
+    @contextmanager
+    def timer(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(time.perf_counter() - start)
@@ -0,0 +1,118 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+import cv2
+import numpy as np
+from metrics import timer, inc
+
+# Qualidade padrão ao codificar JPEG
+JPEG_QUALITY = 90
+
+# Limites de upload: tamanho do arquivo e quantidade de pixels (lida do cabeçalho)
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.environ.get("UPLOAD_MAX_PIXELS", str(40 * 1000 * 1000)))
+
+# Formatos aceitos no upload
+UPLOAD_FORMATS = ("JPEG", "PNG")
+
+# Maior lado da foto decodificada, antes do recorte do rosto
+UPLOAD_WORK_SIZE = int(os.environ.get("UPLOAD_WORK_SIZE", "1024"))
+
+class InvalidImageError(ValueError):
+    pass
+
+# Função para redimensionar imagens mantendo a proporção
+def resize_image(image, target_size):
+    if image is None:
+        return None
+
+    with timer("resize_image_seconds"):
+        if isinstance(image, np.ndarray):
+            # Se for numpy array (da câmera), converter para PIL Image
+            image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+        # Redimensionar mantendo a proporção
+        image.thumbnail(target_size, Image.Resampling.LANCZOS)
+
+        # Criar uma nova imagem com fundo branco para o tamanho exato
+        new_image = Image.new("RGB", target_size, (255, 255, 255))
+        # Colar a imagem redimensionada no centro
+        new_image.paste(
+            image,
+            ((target_size[0] - image.width) // 2, (target_size[1] - image.height) // 2)
+        )
+
+    return new_image
+
+# Função para abrir um JPEG já decodificando em escala reduzida (draft mode)
+def open_image_draft(path, target_size):
+    image = Image.open(path)
+    # Para JPEG o libjpeg decodifica direto em 1/2, 1/4 ou 1/8 do tamanho,
+    # sem nunca ficar menor que target_size; para outros formatos é ignorado
+    image.draft("RGB", target_size)
+    image.load()
+    return image
+
+# Função para codificar uma imagem PIL em bytes JPEG
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=quality)
+    return buffered.getvalue()
+
+# Função para gravar bytes de forma atômica (evita leitura de arquivo pela metade)
+def write_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+# Impressão digital dos bytes de um upload, para reaproveitar o resultado entre reruns
+def upload_fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+# Redução em dois estágios: primeiro por um fator inteiro (reduce, barato) até
+# ficar perto do dobro do tamanho final, depois LANCZOS até `max_side`
+def fast_downscale(image, max_side):
+    largest = max(image.size)
+    if largest <= max_side:
+        return image
+    factor = largest // (2 * max_side)
+    if factor > 1:
+        image = image.reduce(factor)
+    scale = max_side / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+# Decodifica um upload uma única vez, já reduzido. Tamanho, formato e dimensões
+# são validados antes da decodificação completa (só o cabeçalho é lido), para
+# limitar a memória usada por pedido. Retorna uma imagem RGB com a orientação
+# do EXIF aplicada e maior lado até `max_side`.
+def decode_upload(data, max_side=UPLOAD_WORK_SIZE):
+    inc("uploads_total")
+    if len(data) > UPLOAD_MAX_BYTES:
+        raise InvalidImageError(f"Arquivo muito grande (máximo {UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+
+    try:
+        image = Image.open(BytesIO(data))
+    except (UnidentifiedImageError, OSError):
+        raise InvalidImageError("Arquivo não é uma imagem válida")
+    if image.format not in UPLOAD_FORMATS:
+        raise InvalidImageError("Formato não suportado; envie uma foto JPG ou PNG")
+    if image.width * image.height > UPLOAD_MAX_PIXELS:
+        raise InvalidImageError("Imagem com resolução muito alta")
+
+    try:
+        # JPEG: o libjpeg já decodifica em 1/2, 1/4 ou 1/8 do tamanho
+        image.draft("RGB", (max_side, max_side))
+        image.load()
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, ValueError):
+        raise InvalidImageError("Arquivo de imagem corrompido")
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return fast_downscale(image, max_side)
@@ -0,0 +1,191 @@
+import os
+import time
+import uuid
+import queue
+import threading
+from collections import deque
+from metrics import metrics
+
+# Quantidade de jobs executando ao mesmo tempo no processo inteiro
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Quantidade máxima de jobs aguardando na fila
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "32"))
+
+# Tempo que um job finalizado fica disponível para consulta, em segundos
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "600"))
+
+# Estimativa inicial de duração de um job, antes de haver histórico
+JOB_DEFAULT_DURATION = float(os.environ.get("JOB_DEFAULT_DURATION", "15"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+class QueueFullError(Exception):
+    pass
+
+class Job:
+    def __init__(self, func, args, kwargs, key=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.watchers = 1
+        self.done_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, ERROR, CANCELLED)
+
+# Fila de jobs em segundo plano com limite global de concorrência.
+# Jobs com a mesma chave, enquanto não terminam, são executados uma única vez.
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        # O limite conta só os jobs aguardando: cancelados continuam no Queue
+        # até um worker descartá-los, mas não ocupam vaga
+        self.max_queued = max_queued
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._inflight = {}
+        self._pending = []
+        self._durations = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    # As threads só são criadas no primeiro submit
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status == CANCELLED:
+                    continue
+                self._pending.remove(job.id)
+                job.status = RUNNING
+                job.started_at = time.monotonic()
+            metrics.observe("job_wait_seconds", job.started_at - job.submitted_at)
+
+            try:
+                result = job.func(*job.args, **job.kwargs)
+                status, error = DONE, None
+            except Exception as e:
+                result, status, error = None, ERROR, e
+
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.status = status
+                job.finished_at = time.monotonic()
+                self._durations.append(job.finished_at - job.started_at)
+                if job.key is not None and self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+            metrics.observe("job_run_seconds", job.finished_at - job.started_at)
+            metrics.inc("jobs_total", status=status)
+            job.done_event.set()
+
+    # Remove jobs finalizados há mais tempo que o TTL
+    def _expire(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at is not None and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    # Enfileira func(*args, **kwargs) e retorna o id do job
+    def submit(self, func, *args, key=None, **kwargs):
+        with self._lock:
+            self._expire()
+            if key is not None and key in self._inflight:
+                job = self._inflight[key]
+                job.watchers += 1
+                return job.id
+
+            if len(self._pending) >= self.max_queued:
+                raise QueueFullError("Fila de processamento cheia, tente novamente em instantes")
+            job = Job(func, args, kwargs, key=key)
+            self._queue.put_nowait(job)
+            self._jobs[job.id] = job
+            self._pending.append(job.id)
+            if key is not None:
+                self._inflight[key] = job
+            self._start_workers()
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _average_duration(self):
+        if not self._durations:
+            return JOB_DEFAULT_DURATION
+        return sum(self._durations) / len(self._durations)
+
+    # Situação do job: status, posição na fila (1 = próximo) e ETA em segundos
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            average = self._average_duration()
+            position = None
+            eta = 0.0
+            if job.status == QUEUED:
+                position = self._pending.index(job.id) + 1
+                # Rodadas de execução até chegar a vez deste job, mais a própria execução
+                eta = ((position - 1) // self.workers + 1) * average + average / 2
+            elif job.status == RUNNING:
+                eta = max(0.0, average - (time.monotonic() - job.started_at))
+            return {
+                "id": job.id,
+                "status": job.status,
+                "position": position,
+                "eta": eta,
+                "elapsed": time.monotonic() - job.submitted_at,
+                "result": job.result,
+                "error": job.error,
+            }
+
+    # Cancela um job que ainda está na fila; jobs em execução não são interrompidos.
+    # Um job compartilhado por várias submissões só é cancelado quando todas desistem.
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            job.watchers -= 1
+            if job.watchers > 0:
+                return True
+            job.status = CANCELLED
+            job.finished_at = time.monotonic()
+            self._pending.remove(job.id)
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        job.done_event.set()
+        return True
+
+    @property
+    def depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def running(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == RUNNING)
@@ -0,0 +1,69 @@
+import os
+import cv2
+import numpy as np
+from backends import FaceSwapBackend
+from face_detection import largest_face, default_face_region, get_face_cascade, get_profile_cascade
+from image_utils import JPEG_QUALITY
+
+# Swaps locais simultâneos; por padrão um por núcleo (usado para dimensionar a fila de jobs)
+LOCAL_WORKERS = int(os.environ.get("LOCAL_WORKERS", str(os.cpu_count() or 1)))
+
+# Largura usada na detecção de rostos do backend local
+LOCAL_DETECTION_WIDTH = int(os.environ.get("LOCAL_DETECTION_WIDTH", "400"))
+
+# Ajusta média e desvio de cada canal LAB do rosto aos da região de referência
+def _match_colors(face, reference, strength=1.0):
+    face_lab = cv2.cvtColor(face, cv2.COLOR_BGR2LAB).astype(np.float32)
+    ref_lab = cv2.cvtColor(reference, cv2.COLOR_BGR2LAB).astype(np.float32)
+    face_mean, face_std = face_lab.mean(axis=(0, 1)), face_lab.std(axis=(0, 1)) + 1e-6
+    ref_mean, ref_std = ref_lab.mean(axis=(0, 1)), ref_lab.std(axis=(0, 1))
+    matched = (face_lab - face_mean) / face_std * ref_std + ref_mean
+    matched = face_lab + strength * (matched - face_lab)
+    return cv2.cvtColor(np.clip(matched, 0, 255).astype(np.uint8), cv2.COLOR_LAB2BGR)
+
+# Face swap clássico em CPU: o rosto da foto é recortado, redimensionado para
+# o rosto do estilo, tem as cores ajustadas e é mesclado com seamlessClone.
+# `slider` controla a intensidade da troca e `adv_slider` o ajuste de cor.
+def swap_faces(source, target, slider=100, adv_slider=100):
+    source_face = largest_face(source, LOCAL_DETECTION_WIDTH)
+    if source_face is None:
+        raise ValueError("Nenhum rosto encontrado na sua foto")
+    # Muitas fotos de estilo mostram a cabeça de lado ou cortada
+    target_face = largest_face(target, LOCAL_DETECTION_WIDTH) or default_face_region(target)
+
+    sx, sy, sw, sh = source_face
+    tx, ty, tw, th = target_face
+    face = cv2.resize(source[sy:sy + sh, sx:sx + sw], (tw, th), interpolation=cv2.INTER_AREA)
+    face = _match_colors(face, target[ty:ty + th, tx:tx + tw], strength=adv_slider / 100)
+
+    # Máscara elíptica só com a região do rosto, deixando cabelo e testa do estilo
+    mask = np.zeros((th, tw), np.uint8)
+    cv2.ellipse(mask, (tw // 2, th // 2 + th // 16), (int(tw * 0.38), int(th * 0.46)), 0, 0, 360, 255, -1)
+
+    blended = cv2.seamlessClone(face, target, mask, (tx + tw // 2, ty + th // 2), cv2.NORMAL_CLONE)
+    alpha = max(0.0, min(1.0, slider / 100))
+    return cv2.addWeighted(blended, alpha, target, 1.0 - alpha, 0)
+
+# Backend local: roda o face swap na própria máquina, sem chamadas externas.
+# Os classificadores são carregados uma única vez por processo. O paralelismo
+# vem dos workers da fila de jobs (LOCAL_WORKERS); a detecção de rostos em si
+# é serializada, pois os classificadores são compartilhados com a câmera.
+class LocalBackend(FaceSwapBackend):
+    name = "local"
+    workers = LOCAL_WORKERS
+
+    def swap(self, source_path, target_path, slider=100, adv_slider=100):
+        source = cv2.imread(source_path)
+        target = cv2.imread(target_path)
+        if source is None or target is None:
+            raise ValueError("Não foi possível ler as imagens do face swap")
+
+        result = swap_faces(source, target, slider=slider, adv_slider=adv_slider)
+        ok, buffer = cv2.imencode(".jpg", result, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise ValueError("Falha ao codificar o resultado do face swap")
+        return buffer.tobytes()
+
+    def warm_up(self):
+        get_face_cascade()
+        get_profile_cascade()
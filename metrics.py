@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Porta do endpoint Prometheus (/metrics); vazio desativa o servidor
+METRICS_PORT = os.environ.get("METRICS_PORT", "")
+
+# Endereço do endpoint; o padrão só aceita conexões locais (o endpoint não tem autenticação)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+# Limites dos buckets dos histogramas de latência, em segundos
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Amostras recentes mantidas por histograma para os percentis da página de admin
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "512"))
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+# Histograma de latência: buckets cumulativos (formato Prometheus) e uma
+# janela com as últimas amostras, usada para p50/p95/p99
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, window=METRICS_WINDOW):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self._recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def summary(self):
+        samples = sorted(self._recent)
+        if not samples:
+            return {"count": self.count, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+
+        def percentile(q):
+            return 1000 * samples[min(len(samples) - 1, int(len(samples) * q))]
+
+        return {
+            "count": self.count,
+            "mean_ms": 1000 * self.sum / self.count,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+# Registro de métricas do processo: contadores e gauges (valor mantido aqui ou
+# lido na hora por uma função) e histogramas, todos com labels opcionais
+class MetricsRegistry:
+    def __init__(self):
+        self._counters = {}
+        self._counter_funcs = {}
+        self._gauges = {}
+        self._gauge_funcs = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    # Gauge calculado na leitura (ex.: profundidade da fila)
+    def register_gauge(self, name, func, **labels):
+        with self._lock:
+            self._gauge_funcs[(name, _labels_key(labels))] = func
+
+    # Contador mantido por outro objeto e lido na coleta (ex.: acertos do cache)
+    def register_counter(self, name, func, **labels):
+        with self._lock:
+            self._counter_funcs[(name, _labels_key(labels))] = func
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Mede o tempo do bloco e registra no histograma `name`
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # Valores mantidos aqui junto com os lidos das funções registradas
+    def _read(self, values, funcs):
+        with self._lock:
+            values = dict(values)
+            funcs = list(funcs.items())
+        for key, func in funcs:
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return values
+
+    # Valores atuais, para a página de admin
+    def snapshot(self):
+        counters = self._read(self._counters, self._counter_funcs)
+        gauges = self._read(self._gauges, self._gauge_funcs)
+        with self._lock:
+            histograms = {key: histogram.summary() for key, histogram in self._histograms.items()}
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    # Exportação no formato texto do Prometheus
+    def render_prometheus(self):
+        counters = self._read(self._counters, self._counter_funcs)
+        gauges = self._read(self._gauges, self._gauge_funcs)
+        with self._lock:
+            histograms = {
+                key: (histogram.buckets, list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self._histograms.items()
+            }
+
+        lines = []
+        def header(name, kind, seen):
+            if name in seen:
+                return
+            seen.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter", seen)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge", seen)
+            lines.append(f"{name}{_format_labels(labels)} {float(value)}")
+        for (name, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+            header(name, "histogram", seen)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+# Instância única do registro, criada na importação do módulo
+metrics = MetricsRegistry()
+
+def timer(name, **labels):
+    return metrics.timer(name, **labels)
+
+def inc(name, amount=1, **labels):
+    metrics.inc(name, amount, **labels)
+
+# Conta objetos vivos no gauge `name` (ex.: sessões da câmera): soma 1 agora
+# e subtrai 1 no primeiro release() ou quando `owner` for coletado
+class ActiveTracker:
+    def __init__(self, owner, name, registry=metrics):
+        registry.add_gauge(name, 1)
+        self._finalizer = weakref.finalize(owner, registry.add_gauge, name, -1)
+
+    def release(self):
+        self._finalizer()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Servidor HTTP do endpoint /metrics numa thread em segundo plano
+def start_metrics_server(port, host=METRICS_HOST):
+    server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,82 @@
+import os
+import streamlit as st
+from metrics import metrics
+from services import setup_metrics
+
+# Token para abrir a página de métricas; sem ele a página fica bloqueada
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+st.set_page_config(page_title="Barbearia Virtual - Métricas", page_icon="📊", layout="wide")
+
+st.title("📊 Métricas")
+
+# A página aparece no menu para todos; só quem tem o token vê as métricas
+if not ADMIN_TOKEN:
+    st.warning("Página desativada: defina ADMIN_TOKEN no servidor para acessar as métricas.")
+    st.stop()
+if st.text_input("Token de administrador", type="password") != ADMIN_TOKEN:
+    st.stop()
+
+# Registra as métricas mesmo que a página principal ainda não tenha sido aberta
+setup_metrics()
+
+# Nome da métrica com os labels, para as tabelas
+def metric_name(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ", ".join(f"{label}={value}" for label, value in labels) + "}"
+
+# Taxa de acerto de um cache a partir dos contadores de acertos e falhas
+def hit_rate(counters, prefix):
+    hits = counters.get((f"{prefix}_hits", ()), 0)
+    misses = counters.get((f"{prefix}_misses", ()), 0)
+    return hits / (hits + misses) if hits + misses else None
+
+# Atualiza sozinho a cada 5 segundos
+@st.fragment(run_every=5)
+def show_metrics():
+    snapshot = metrics.snapshot()
+    gauges = snapshot['gauges']
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Fila de jobs", int(gauges.get(("job_queue_depth", ()), 0)))
+    col2.metric("Jobs em execução", int(gauges.get(("job_queue_running", ()), 0)))
+    col3.metric("Câmeras ativas", int(gauges.get(("webcam_sessions_active", ()), 0)))
+    col4.metric("Backend", "fora do ar" if gauges.get(("backend_circuit_open", ()), False) else "ok")
+
+    col1, col2 = st.columns(2)
+    for col, label, prefix in ((col1, "Cache de resultados", "result_cache"), (col2, "Cache de miniaturas", "thumbnail_cache")):
+        rate = hit_rate(snapshot['counters'], prefix)
+        col.metric(f"{label} (acertos)", "-" if rate is None else f"{rate:.0%}")
+
+    st.markdown("### Latência por etapa")
+    st.dataframe(
+        [
+            {
+                "etapa": metric_name(key),
+                "chamadas": summary['count'],
+                "média (ms)": round(summary['mean_ms'], 1),
+                "p50 (ms)": round(summary['p50_ms'], 1),
+                "p95 (ms)": round(summary['p95_ms'], 1),
+                "p99 (ms)": round(summary['p99_ms'], 1),
+            }
+            for key, summary in sorted(snapshot['histograms'].items())
+        ],
+        use_container_width=True
+    )
+
+    st.markdown("### Contadores")
+    st.dataframe(
+        [{"métrica": metric_name(key), "valor": value} for key, value in sorted(snapshot['counters'].items())],
+        use_container_width=True
+    )
+
+show_metrics()
+
+st.markdown("### Exportação Prometheus")
+st.caption("Também disponível em /metrics quando METRICS_PORT está definido.")
+export = metrics.render_prometheus()
+st.download_button("⬇️ Baixar métricas", data=export, file_name="metrics.txt", mime="text/plain")
+with st.expander("Ver texto"):
+    st.code(export, language="text")
@@ -0,0 +1,151 @@
+import os
+import weakref
+from backends import face_swap
+from result_cache import result_key
+from job_queue import QueueFullError, QUEUED, RUNNING
+from resilience import CircuitOpenError
+
+# Pré-processamento especulativo ligado por padrão ("1") ou só quando o usuário ativa
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "0") == "1"
+
+# Swaps especulativos que uma sessão pode gastar sem que o resultado seja usado
+PREFETCH_BUDGET = int(os.environ.get("PREFETCH_BUDGET", "4"))
+
+# Swaps especulativos da sessão em andamento ao mesmo tempo
+PREFETCH_PARALLELISM = int(os.environ.get("PREFETCH_PARALLELISM", "1"))
+
+# Com mais jobs que isso aguardando na fila global, nada é pré-processado
+PREFETCH_MAX_QUEUE_DEPTH = int(os.environ.get("PREFETCH_MAX_QUEUE_DEPTH", "2"))
+
+# Estilos seguintes da página da galeria pré-processados além do selecionado
+PREFETCH_NEXT_STYLES = int(os.environ.get("PREFETCH_NEXT_STYLES", "2"))
+
+def _cancel_jobs(job_queue, jobs):
+    for job_id in list(jobs.values()):
+        job_queue.cancel(job_id)
+    jobs.clear()
+
+# Ordem de pré-processamento: o estilo selecionado e os seguintes da página
+# (dando a volta no fim da página), sem repetir
+def prefetch_order(selected_id, page_ids, next_styles=PREFETCH_NEXT_STYLES):
+    order = [selected_id] if selected_id else []
+    if page_ids:
+        start = page_ids.index(selected_id) + 1 if selected_id in page_ids else 0
+        following = page_ids[start:] + page_ids[:start]
+        order += [style_id for style_id in following if style_id not in order][:next_styles]
+    return order
+
+# Face swaps especulativos de uma sessão: enquanto o usuário navega, os estilos
+# mais prováveis são processados em segundo plano e o resultado fica no cache,
+# de modo que o clique em "Aplicar" volta na hora. O orçamento só é gasto com
+# swaps que não foram usados; estilos que saem da lista são cancelados se ainda
+# estiverem na fila, e a sessão encerrada cancela o que sobrou.
+class Prefetcher:
+    def __init__(self, job_queue, backend, result_cache, budget=PREFETCH_BUDGET,
+                 parallelism=PREFETCH_PARALLELISM, max_queue_depth=PREFETCH_MAX_QUEUE_DEPTH):
+        self.job_queue = job_queue
+        self.backend = backend
+        self.result_cache = result_cache
+        self.budget = budget
+        self.parallelism = max(1, parallelism)
+        self.max_queue_depth = max_queue_depth
+        self.source_path = None
+        self.source_digest = None
+        self.wanted = []
+        self.jobs = {}
+        self.prefetched = set()
+        self.spent = 0
+        self._finalizer = weakref.finalize(self, _cancel_jobs, job_queue, self.jobs)
+
+    @property
+    def remaining(self):
+        return max(0, self.budget - self.spent)
+
+    # Há estilos em processamento ou ainda por pré-processar
+    @property
+    def active(self):
+        if self.jobs:
+            return True
+        return self.source_digest is not None and self.remaining > 0 and any(
+            style['id'] not in self.prefetched and self._key(style['id']) not in self.result_cache
+            for style in self.wanted
+        )
+
+    def _key(self, style_id):
+        return result_key(self.source_digest, style_id, backend=self.backend.name)
+
+    # Define a foto; uma foto nova descarta tudo que era da anterior
+    def set_source(self, source_path, source_digest):
+        if source_digest != self.source_digest:
+            self.cancel()
+            self.prefetched.clear()
+        self.source_path = source_path
+        self.source_digest = source_digest
+
+    # Define os estilos desejados, em ordem de prioridade (dicts com id e path)
+    def request(self, styles):
+        self.wanted = list(styles)
+        wanted_ids = {style['id'] for style in self.wanted}
+        for style_id, job_id in list(self.jobs.items()):
+            if style_id not in wanted_ids and self.job_queue.cancel(job_id):
+                del self.jobs[style_id]
+                # Não chegou a rodar: devolve ao orçamento
+                self._refund(style_id)
+
+    # Devolve ao orçamento o swap de um estilo, uma única vez (o mesmo estilo
+    # pode ser usado pelo usuário e depois ter o job cancelado)
+    def _refund(self, style_id):
+        if style_id in self.prefetched:
+            self.prefetched.discard(style_id)
+            self.spent = max(0, self.spent - 1)
+
+    # O usuário aplicou o estilo: o swap especulativo não foi desperdiçado
+    def mark_used(self, style_id):
+        self._refund(style_id)
+
+    # Coleta os jobs terminados e enfileira os próximos estilos dentro do orçamento
+    def step(self):
+        for style_id, job_id in list(self.jobs.items()):
+            status = self.job_queue.status(job_id)
+            if status is None or status['status'] not in (QUEUED, RUNNING):
+                del self.jobs[style_id]
+
+        if self.source_digest is None:
+            return
+        # Com o backend fora do ar não vale gastar o orçamento
+        try:
+            self.backend.check()
+        except CircuitOpenError:
+            return
+        for style in self.wanted:
+            if len(self.jobs) >= self.parallelism or self.remaining == 0:
+                break
+            if style['id'] in self.prefetched or style['id'] in self.jobs:
+                continue
+            cache_key = self._key(style['id'])
+            if cache_key in self.result_cache:
+                continue
+            # Fila global carregada: a vez é de quem clicou em "Aplicar"
+            if self.job_queue.depth >= self.max_queue_depth:
+                break
+            try:
+                self.jobs[style['id']] = self.job_queue.submit(
+                    face_swap,
+                    self.backend,
+                    self.result_cache,
+                    self.source_path,
+                    style['path'],
+                    cache_key=cache_key,
+                    key=cache_key
+                )
+            except QueueFullError:
+                break
+            self.prefetched.add(style['id'])
+            self.spent += 1
+
+    # Cancela os swaps que ainda não começaram; os que estão rodando terminam no cache
+    def cancel(self):
+        for style_id, job_id in list(self.jobs.items()):
+            if self.job_queue.cancel(job_id):
+                self._refund(style_id)
+        self.jobs.clear()
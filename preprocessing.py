@@ -0,0 +1,73 @@
+import os
+import math
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+from face_detection import detect_faces, detect_eyes
+from image_utils import resize_image
+
+# Tamanho final da foto enviada ao backend
+SOURCE_SIZE = (400, 400)
+
+# Margem em volta do rosto no recorte, como fração do tamanho do rosto
+FACE_CROP_MARGIN = float(os.environ.get("FACE_CROP_MARGIN", "0.6"))
+
+# Inclinação máxima (graus) corrigida pelo alinhamento dos olhos
+MAX_ALIGN_ANGLE = float(os.environ.get("MAX_ALIGN_ANGLE", "30"))
+
+# Ângulo da linha entre os olhos, em graus, ou None se não der para medir
+def _eye_angle(gray, face):
+    x, y, w, h = face
+    # Os olhos ficam na metade de cima do rosto
+    eyes = detect_eyes(gray[y:y + h // 2, x:x + w])
+    if len(eyes) < 2:
+        return None
+    eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+    (lx, ly, lw, lh), (rx, ry, rw, rh) = sorted(eyes, key=lambda e: e[0])
+    dx = (rx + rw / 2) - (lx + lw / 2)
+    dy = (ry + rh / 2) - (ly + lh / 2)
+    if dx <= 0:
+        return None
+    angle = math.degrees(math.atan2(dy, dx))
+    return angle if abs(angle) <= MAX_ALIGN_ANGLE else None
+
+# Prepara a foto do usuário para o face swap: corrige a orientação pelo EXIF,
+# detecta e alinha o rosto, recorta com margem e normaliza tamanho e cores.
+# Sem rosto detectado, cai no redimensionamento padrão (resize_image).
+def prepare_source(image, target_size=SOURCE_SIZE):
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    rgb = np.asarray(image)
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    faces = detect_faces(gray, width=max(target_size))
+    if not faces:
+        return resize_image(image, target_size)
+
+    face = max(faces, key=lambda f: f[2] * f[3])
+    x, y, w, h = face
+    center = (x + w / 2, y + h / 2)
+
+    # Alinhar: girar em volta do centro do rosto para deixar os olhos na horizontal
+    angle = _eye_angle(gray, face)
+    if angle:
+        image = image.rotate(angle, resample=Image.Resampling.BICUBIC, center=center,
+                             fillcolor=(255, 255, 255))
+
+    # Recorte quadrado em volta do rosto; o que sair da foto fica branco
+    side = max(w, h) * (1 + 2 * FACE_CROP_MARGIN)
+    box = (
+        int(round(center[0] - side / 2)),
+        int(round(center[1] - side / 2)),
+        int(round(center[0] + side / 2)),
+        int(round(center[1] + side / 2)),
+    )
+    crop = Image.new("RGB", (box[2] - box[0], box[3] - box[1]), (255, 255, 255))
+    crop.paste(image.crop((
+        max(box[0], 0), max(box[1], 0), min(box[2], image.width), min(box[3], image.height)
+    )), (max(-box[0], 0), max(-box[1], 0)))
+
+    crop = crop.resize(target_size, Image.Resampling.LANCZOS)
+    # Normaliza o contraste, ignorando 1% dos extremos
+    return ImageOps.autocontrast(crop, cutoff=1)
@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+import httpx
+from gradio_client.exceptions import AppError
+from gradio_client.utils import QueueError, TooManyRequestsError
+from metrics import inc
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# Tempo máximo de uma chamada ao backend, em segundos
+BACKEND_TIMEOUT = float(os.environ.get("BACKEND_TIMEOUT", "90"))
+
+# Tentativas por chamada em erros transitórios, e espera entre elas (exponencial com jitter)
+BACKEND_RETRIES = int(os.environ.get("BACKEND_RETRIES", "3"))
+BACKEND_RETRY_WAIT = float(os.environ.get("BACKEND_RETRY_WAIT", "1"))
+BACKEND_RETRY_MAX_WAIT = float(os.environ.get("BACKEND_RETRY_MAX_WAIT", "10"))
+
+# Falhas seguidas que abrem o circuito e tempo até testar o backend de novo
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+
+# Início das mensagens de ValueError do gradio_client quando o Space está
+# fora do ar, dormindo ou com problema (não são erros do pedido)
+GRADIO_OUTAGE_MESSAGES = (
+    "Could not fetch config",
+    "Could not get Gradio config",
+    "Could not fetch api info",
+    "Could not find Space",
+    "The current space is in the invalid state",
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Serviço de face swap instável no momento; nova tentativa em {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+# Erros que valem nova tentativa: timeout, conexão, respostas HTTP de sobrecarga
+# e os erros do gradio_client para Space sobrecarregado ou fora do ar. O Space
+# não expõe o erro original, então um AppError (exceção dentro do Space, ex.:
+# cota de GPU) também conta como falha do backend.
+# Erros do próprio pedido (ex.: nenhum rosto na foto) não são repetidos.
+def is_transient(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    if isinstance(error, (TooManyRequestsError, QueueError, AppError)):
+        return True
+    if type(error) is ValueError:
+        return str(error).startswith(GRADIO_OUTAGE_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError))
+
+# Repete `func` em erros transitórios, com espera exponencial e jitter
+def call_with_retries(func, attempts=BACKEND_RETRIES, wait=BACKEND_RETRY_WAIT, max_wait=BACKEND_RETRY_MAX_WAIT):
+    retrying = Retrying(
+        stop=stop_after_attempt(max(1, attempts)),
+        wait=wait_random_exponential(multiplier=wait, max=max_wait),
+        retry=retry_if_exception(is_transient),
+        before_sleep=lambda state: inc("backend_retries_total"),
+        reraise=True
+    )
+    return retrying(func)
+
+# Disjuntor compartilhado pelas sessões: depois de `failure_threshold` falhas
+# seguidas as chamadas falham na hora (CircuitOpenError), sem chegar ao backend.
+# Passado `reset_timeout`, uma única chamada de teste é liberada (meio aberto):
+# se der certo o circuito fecha, se falhar abre de novo.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _state(self):
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    # Segundos até o circuito aceitar uma chamada de teste
+    @property
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    # Falha na hora se o circuito estiver aberto, sem ocupar a chamada de teste
+    def check(self):
+        with self._lock:
+            state = self._state()
+            if state == OPEN or (state == HALF_OPEN and self._trial_running):
+                raise CircuitOpenError(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)))
+
+    # Libera a chamada; retorna True se ela for a chamada de teste do meio aberto
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == CLOSED:
+                return False
+            if state == OPEN or self._trial_running:
+                raise CircuitOpenError(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)))
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
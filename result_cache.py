@@ -0,0 +1,128 @@
+import os
+import hashlib
+import threading
+from cachetools import LRUCache
+from image_utils import write_atomic
+
+# Quantidade de resultados mantidos em memória (evicção LRU)
+RESULT_CACHE_ITEMS = int(os.environ.get("RESULT_CACHE_ITEMS", "64"))
+
+# Diretório do cache em disco (vazio desativa) e tamanho máximo em bytes
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", ".result_cache")
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Hash dos pixels normalizados (RGB) de uma imagem
+def image_digest(image):
+    image = image if image.mode == "RGB" else image.convert("RGB")
+    digest = hashlib.sha256()
+    digest.update(f"{image.width}x{image.height}|".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+# Chave do resultado a partir do hash da foto já calculado.
+# O nome do backend entra na chave porque cada backend gera um resultado diferente.
+def result_key(source_digest, style_id, slider=100, adv_slider=100, backend="remote"):
+    return hashlib.sha256(f"{backend}|{source_digest}|{style_id}|{slider}|{adv_slider}".encode("utf-8")).hexdigest()
+
+# Chave do resultado: hash dos pixels normalizados da foto, do estilo e dos parâmetros
+def make_result_key(source_image, style_id, slider=100, adv_slider=100, backend="remote"):
+    return result_key(image_digest(source_image), style_id, slider, adv_slider, backend)
+
+# Cache de resultados do face swap em dois níveis: memória (LRU) e disco,
+# com evicção no disco pelos arquivos menos usados quando passa do limite
+class ResultCache:
+    def __init__(self, max_items=RESULT_CACHE_ITEMS, cache_dir=RESULT_CACHE_DIR,
+                 max_disk_bytes=RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = LRUCache(maxsize=max_items)
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".jpg"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    # Remove os arquivos mais antigos (por último acesso) até caber no limite
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._disk_bytes = total
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return bool(self.cache_dir) and os.path.exists(self._disk_path(key))
+
+    # Retorna os bytes JPEG do resultado ou None
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self.hits += 1
+                return data
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Atualiza o mtime para a evicção considerar o último acesso
+                os.utime(path)
+            except FileNotFoundError:
+                data = None
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory[key] = data
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            if not self.cache_dir:
+                return
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                return
+            write_atomic(path, data)
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir:
+                for _, path, _ in self._disk_entries():
+                    os.unlink(path)
+                self._disk_bytes = 0
@@ -0,0 +1,57 @@
+import threading
+import streamlit as st
+from backends import create_backend, FACE_SWAP_BACKEND
+from job_queue import JobQueue, JOB_WORKERS
+from metrics import metrics, start_metrics_server, METRICS_PORT
+from resilience import CLOSED
+from result_cache import ResultCache
+from thumbnails import get_thumbnail_cache
+
+# Recursos únicos no processo, compartilhados por todas as sessões e por
+# todas as páginas do app (a página de métricas usa os mesmos objetos)
+
+# Backend de face swap (FACE_SWAP_BACKEND), compartilhado entre todas as sessões.
+# O backend é aquecido em segundo plano assim que é criado.
+@st.cache_resource
+def get_backend():
+    # O token do Hugging Face só é necessário para o Space remoto
+    hf_token = st.secrets["hungging"] if FACE_SWAP_BACKEND == "remote" else None
+    backend = create_backend(hf_token=hf_token)
+    threading.Thread(target=backend.warm_up, daemon=True).start()
+    return backend
+
+# Cache de resultados (memória + disco), compartilhado entre todas as sessões
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+# Fila de jobs de face swap, com limite global de chamadas simultâneas ao modelo
+@st.cache_resource
+def get_job_queue():
+    # O backend local roda na própria CPU: um worker por núcleo
+    workers = get_backend().workers or JOB_WORKERS
+    return JobQueue(workers=workers)
+
+# Métricas do processo: valores lidos na hora da coleta (fila, caches, disjuntor)
+# e, com METRICS_PORT definido, o endpoint /metrics no formato do Prometheus.
+# Chamado pela página principal e pela de métricas, o que abrir primeiro.
+@st.cache_resource
+def setup_metrics():
+    job_queue = get_job_queue()
+    result_cache = get_result_cache()
+    thumbnail_cache = get_thumbnail_cache()
+    backend = get_backend()
+
+    metrics.register_gauge("job_queue_depth", lambda: job_queue.depth)
+    metrics.register_gauge("job_queue_running", lambda: job_queue.running)
+    metrics.register_counter("result_cache_hits", lambda: result_cache.hits)
+    metrics.register_counter("result_cache_misses", lambda: result_cache.misses)
+    metrics.register_counter("thumbnail_cache_hits", lambda: thumbnail_cache.hits)
+    metrics.register_counter("thumbnail_cache_misses", lambda: thumbnail_cache.misses)
+    breaker = getattr(backend, 'breaker', None)
+    if breaker is not None:
+        metrics.register_gauge("backend_circuit_open", lambda: breaker.state != CLOSED)
+
+    if METRICS_PORT:
+        return start_metrics_server(METRICS_PORT)
+    return None
@@ -0,0 +1,158 @@
+import os
+import sys
+import cv2
+import numpy as np
+from face_detection import largest_face, default_face_region
+from catalog import STYLES_DIR, CATALOG_FILE, load_catalog
+
+# Arquivo do índice de vetores dos estilos (gerado por `python style_index.py`)
+STYLE_INDEX_FILE = os.environ.get("STYLE_INDEX_FILE", os.path.join(STYLES_DIR, "style_index.npz"))
+
+# Quantidade de estilos recomendados
+STYLE_RECOMMENDATIONS = int(os.environ.get("STYLE_RECOMMENDATIONS", "6"))
+
+# Largura usada para extrair as características (a imagem é reduzida antes)
+EMBEDDING_WIDTH = 400
+
+# Faixas horizontais usadas no perfil de largura do rosto (testa até o queixo)
+FACE_PROFILE_BANDS = 8
+
+# Peso de cada bloco do vetor na distância: formato do rosto e região do cabelo
+FACE_SHAPE_WEIGHT = 1.0
+HAIR_WEIGHT = 0.5
+
+# Tamanho de cada bloco: proporção + perfil de largura; cor (LAB), textura e volume do cabelo
+FACE_SHAPE_DIMS = 1 + FACE_PROFILE_BANDS
+HAIR_DIMS = 6 + 2
+EMBEDDING_DIMS = FACE_SHAPE_DIMS + HAIR_DIMS
+
+# Pixels com tom de pele (faixa clássica em YCrCb)
+def _skin_mask(bgr):
+    ycrcb = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb)
+    return cv2.inRange(ycrcb, (0, 133, 77), (255, 173, 127)) > 0
+
+# Formato do rosto: proporção da caixa e largura da pele em faixas horizontais,
+# normalizada pela faixa mais larga (distingue rosto oval, redondo, quadrado...)
+def _face_shape(img, face):
+    x, y, w, h = face
+    # A caixa do Haar corta as laterais; amplia um pouco para pegar o contorno
+    x0, x1 = max(0, x - w // 8), min(img.shape[1], x + w + w // 8)
+    skin = _skin_mask(img[y:y + h, x0:x1])
+    widths = np.array([band.any(axis=0).sum() if band.size else 0
+                       for band in np.array_split(skin, FACE_PROFILE_BANDS, axis=0)], np.float32)
+    widths /= max(float(widths.max()), 1.0)
+    return np.concatenate([[h / max(w, 1)], widths]).astype(np.float32)
+
+# Região do cabelo: faixa acima e ao lado do rosto, sem pele e sem fundo claro.
+# Retorna cor média e desvio em LAB, textura (bordas) e volume (área de cabelo / rosto)
+def _hair_features(img, face):
+    x, y, w, h = face
+    top = max(0, y - int(h * 0.6))
+    x0, x1 = max(0, x - w // 4), min(img.shape[1], x + w + w // 4)
+    region = img[top:y + h // 4, x0:x1]
+    if region.size == 0:
+        return np.zeros(HAIR_DIMS, np.float32)
+
+    lab = cv2.cvtColor(region, cv2.COLOR_BGR2LAB).reshape(-1, 3).astype(np.float32)
+    hair = ~_skin_mask(region).reshape(-1) & (lab[:, 0] < 200)
+    if not hair.any():
+        return np.zeros(HAIR_DIMS, np.float32)
+
+    gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+    edges = np.abs(cv2.Laplacian(gray, cv2.CV_32F)).reshape(-1)[hair]
+    pixels = lab[hair] / 255.0
+    return np.concatenate([
+        pixels.mean(axis=0),
+        pixels.std(axis=0),
+        [edges.mean() / 255.0, hair.sum() / float(w * h)],
+    ]).astype(np.float32)
+
+# Vetor de características de uma foto BGR (formato do rosto + cabelo)
+def embed_image(img):
+    if img.shape[1] > EMBEDDING_WIDTH:
+        scale = EMBEDDING_WIDTH / img.shape[1]
+        img = cv2.resize(img, (EMBEDDING_WIDTH, int(round(img.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+    face = largest_face(img, EMBEDDING_WIDTH) or default_face_region(img)
+    return np.concatenate([_face_shape(img, face), _hair_features(img, face)])
+
+# Vetor de características de uma imagem PIL (foto do usuário)
+def embed_pil(image):
+    return embed_image(cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR))
+
+# Índice em memória: uma matriz com um vetor por estilo, padronizada
+# (média/desvio de cada dimensão) e ponderada por bloco, para a distância
+# euclidiana ser calculada de uma vez para todos os estilos
+class StyleIndex:
+    def __init__(self, ids, vectors, hashes=None):
+        self.ids = list(ids)
+        self.vectors = np.asarray(vectors, np.float32)
+        self.hashes = list(hashes) if hashes is not None else [""] * len(self.ids)
+        self._mean = self.vectors.mean(axis=0) if len(self.ids) else np.zeros(EMBEDDING_DIMS, np.float32)
+        std = self.vectors.std(axis=0) if len(self.ids) else np.ones(EMBEDDING_DIMS, np.float32)
+        # Dimensões constantes em todos os estilos não devem dominar a distância
+        self._std = np.where(std > 1e-6, std, 1.0).astype(np.float32)
+        self._weights = np.concatenate([
+            np.full(FACE_SHAPE_DIMS, FACE_SHAPE_WEIGHT, np.float32),
+            np.full(HAIR_DIMS, HAIR_WEIGHT, np.float32),
+        ])
+        self._normalized = self._normalize(self.vectors)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _normalize(self, vectors):
+        return (vectors - self._mean) / self._std * self._weights
+
+    # Ids dos `k` estilos mais próximos do vetor, do mais parecido ao menos
+    def nearest(self, vector, k=STYLE_RECOMMENDATIONS, allowed=None):
+        if not self.ids:
+            return []
+        distances = np.linalg.norm(self._normalized - self._normalize(vector), axis=1)
+        if allowed is not None:
+            distances = np.where(np.isin(self.ids, list(allowed)), distances, np.inf)
+        k = min(k, int(np.isfinite(distances).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(distances, k - 1)[:k]
+        return [self.ids[i] for i in top[np.argsort(distances[top])]]
+
+    # Se o índice corresponde ao catálogo (mesmos estilos e mesmos arquivos)
+    def matches(self, catalog):
+        return dict(zip(self.ids, self.hashes)) == {style["id"]: style["sha256"] for style in catalog.styles}
+
+    def save(self, path=STYLE_INDEX_FILE):
+        np.savez_compressed(path, ids=np.array(self.ids), vectors=self.vectors, hashes=np.array(self.hashes))
+
+# Calcula os vetores de todos os estilos do catálogo
+def build_index(catalog):
+    ids, vectors, hashes = [], [], []
+    for style in catalog.styles:
+        img = cv2.imread(style["path"])
+        if img is None:
+            continue
+        ids.append(style["id"])
+        vectors.append(embed_image(img))
+        hashes.append(style["sha256"])
+    return StyleIndex(ids, np.array(vectors, np.float32).reshape(-1, EMBEDDING_DIMS), hashes)
+
+def load_index(path=STYLE_INDEX_FILE):
+    with np.load(path) as data:
+        return StyleIndex(data["ids"].tolist(), data["vectors"], data["hashes"].tolist())
+
+# Carrega o índice gerado offline; se não existir ou estiver desatualizado
+# em relação ao catálogo, recalcula em memória
+def load_or_build_index(catalog, path=STYLE_INDEX_FILE):
+    try:
+        index = load_index(path)
+        if index.matches(catalog):
+            return index
+    except (OSError, KeyError, ValueError):
+        pass
+    return build_index(catalog)
+
+# Gera o índice dos estilos: python style_index.py [caminho_do_catalogo]
+if __name__ == "__main__":
+    catalog_file = sys.argv[1] if len(sys.argv) > 1 else CATALOG_FILE
+    index = build_index(load_catalog(catalog_file))
+    index.save(STYLE_INDEX_FILE)
+    print(f"{len(index)} estilos indexados em '{STYLE_INDEX_FILE}'")
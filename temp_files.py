@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import shutil
+import weakref
+import tempfile
+import threading
+from io import BytesIO
+from PIL import Image
+from image_utils import encode_jpeg, write_atomic
+from result_cache import image_digest
+from metrics import timer
+
+# Diretório raiz dos arquivos temporários do app (um subdiretório por sessão)
+TEMP_DIR = os.environ.get("TEMP_DIR", os.path.join(tempfile.gettempdir(), "barbearia"))
+
+# Arquivos sem uso há mais tempo que isso são apagados pelo sweeper, em segundos
+TEMP_FILE_TTL = float(os.environ.get("TEMP_FILE_TTL", "3600"))
+
+# Intervalo entre as varreduras do sweeper, em segundos
+TEMP_SWEEP_INTERVAL = float(os.environ.get("TEMP_SWEEP_INTERVAL", "300"))
+
+# Espaço máximo em disco por sessão, em bytes
+SESSION_TEMP_QUOTA = int(os.environ.get("SESSION_TEMP_QUOTA", str(50 * 1024 * 1024)))
+
+class QuotaExceededError(Exception):
+    pass
+
+# Controla os arquivos temporários gravados para o backend: cada sessão tem
+# seu diretório e sua cota, apagados ao fim da sessão ou pelo sweeper (TTL)
+class TempFileManager:
+    def __init__(self, root=TEMP_DIR, ttl=TEMP_FILE_TTL, quota=SESSION_TEMP_QUOTA):
+        self.root = root
+        self.ttl = ttl
+        self.quota = quota
+        self._lock = threading.Lock()
+        self._sweeper = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.root, session_id)
+
+    def _session_files(self, session_id):
+        session_dir = self._session_dir(session_id)
+        files = []
+        for name in os.listdir(session_dir):
+            path = os.path.join(session_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return sorted(files)
+
+    def usage(self, session_id):
+        if not os.path.isdir(self._session_dir(session_id)):
+            return 0
+        return sum(size for _, _, size in self._session_files(session_id))
+
+    # Grava `data` num arquivo da sessão. Se a cota estourar, os arquivos mais
+    # antigos da própria sessão são apagados primeiro.
+    def write(self, session_id, data, suffix=".jpg"):
+        if len(data) > self.quota:
+            raise QuotaExceededError("Arquivo maior que o espaço disponível para a sessão")
+
+        with self._lock:
+            session_dir = self._session_dir(session_id)
+            os.makedirs(session_dir, exist_ok=True)
+
+            files = self._session_files(session_id)
+            used = sum(size for _, _, size in files)
+            for _, path, size in files:
+                if used + len(data) <= self.quota:
+                    break
+                os.unlink(path)
+                used -= size
+
+            path = os.path.join(session_dir, f"{uuid.uuid4().hex}{suffix}")
+            with timer("temp_write_seconds"):
+                write_atomic(path, data)
+        return path
+
+    def release_session(self, session_id):
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    # Apaga arquivos mais velhos que o TTL e diretórios de sessão vazios
+    def sweep(self):
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for session_id in os.listdir(self.root):
+                session_dir = self._session_dir(session_id)
+                if not os.path.isdir(session_dir):
+                    continue
+                for mtime, path, _ in self._session_files(session_id):
+                    if now - mtime > self.ttl:
+                        try:
+                            os.unlink(path)
+                            removed += 1
+                        except FileNotFoundError:
+                            pass
+                if not os.listdir(session_dir):
+                    os.rmdir(session_dir)
+        return removed
+
+    def start_sweeper(self, interval=TEMP_SWEEP_INTERVAL):
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except OSError:
+                    pass
+
+        self._sweeper = threading.Thread(target=run, daemon=True)
+        self._sweeper.start()
+
+# Arquivos temporários de uma sessão; quando o objeto é coletado
+# (a sessão do Streamlit terminou) o diretório da sessão é apagado
+class TempSession:
+    def __init__(self, manager):
+        self.id = uuid.uuid4().hex
+        self.manager = manager
+        self._finalizer = weakref.finalize(self, manager.release_session, self.id)
+
+    def write(self, data, suffix=".jpg"):
+        return self.manager.write(self.id, data, suffix)
+
+    def usage(self):
+        return self.manager.usage(self.id)
+
+    def release(self):
+        self._finalizer()
+
+# Imagem mantida em memória: os bytes JPEG e o hash dos pixels são calculados
+# uma única vez, e o arquivo em disco só é gravado quando o backend pede um caminho
+class ImagePayload:
+    def __init__(self, image=None, jpeg=None):
+        self._image = image
+        self._jpeg = jpeg
+        self._digest = None
+        self._path = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = Image.open(BytesIO(self._jpeg))
+        return self._image
+
+    @property
+    def jpeg(self):
+        if self._jpeg is None:
+            self._jpeg = encode_jpeg(self._image)
+        return self._jpeg
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = image_digest(self.image)
+        return self._digest
+
+    # Caminho de um arquivo com a imagem; regrava se o sweeper tiver apagado
+    def path(self, temp_session):
+        if self._path is not None and os.path.exists(self._path):
+            # Renova o mtime para o arquivo em uso não expirar no sweeper
+            os.utime(self._path)
+            return self._path
+        self._path = temp_session.write(self.jpeg)
+        return self._path
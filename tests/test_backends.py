@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from io import BytesIO
+import numpy as np
+import pytest
+from PIL import Image
+from backends import ClientPool, StubClient, create_backend
+from result_cache import make_result_key
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "1.jpg")
+STYLE = os.path.join(ROOT, "styles", "3.jpg")
+
+def test_local_backend_swap_returns_jpeg():
+    result = create_backend("local").swap(SOURCE, STYLE)
+    image = Image.open(BytesIO(result))
+    assert image.format == "JPEG"
+    assert image.size == Image.open(STYLE).size
+
+def test_local_backend_without_face_raises(tmp_path):
+    blank = tmp_path / "blank.jpg"
+    Image.new("RGB", (400, 400), (255, 255, 255)).save(blank)
+    with pytest.raises(ValueError):
+        create_backend("local").swap(str(blank), STYLE)
+
+# Num processo novo, sem warm_up, o primeiro swap carrega os classificadores
+# (este estilo não tem rosto de frente, então passa pelo classificador de perfil)
+def test_local_backend_swap_on_cold_process():
+    code = (
+        "from backends import create_backend; "
+        f"print(len(create_backend('local').swap({SOURCE!r}, {STYLE!r})))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout) > 0
+
+def test_client_pool_reuses_clients():
+    pool = ClientPool(lambda: StubClient(latency=0), size=2)
+    with pool.client() as first:
+        pass
+    with pool.client() as second:
+        pass
+    assert first is second
+    assert pool.created == 1
+    assert pool.idle == 1
+
+def test_client_pool_discards_client_after_error():
+    pool = ClientPool(lambda: StubClient(latency=0), size=2)
+    with pytest.raises(RuntimeError):
+        with pool.client() as broken:
+            raise RuntimeError("falha no backend")
+    assert pool.created == 0
+    assert pool.idle == 0
+
+    with pool.client() as client:
+        pass
+    assert client is not broken
+    assert pool.created == 1
+
+def test_stub_backend_swap():
+    result = create_backend("stub").swap(SOURCE, STYLE)
+    with open(STYLE, "rb") as f:
+        assert result == f.read()
+
+def test_result_key_depends_on_backend():
+    image = Image.fromarray(np.zeros((8, 8, 3), np.uint8))
+    assert make_result_key(image, "1.jpg", backend="remote") != make_result_key(image, "1.jpg", backend="local")
+    assert make_result_key(image, "1.jpg", backend="local") == make_result_key(image, "1.jpg", backend="local")
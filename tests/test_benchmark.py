@@ -0,0 +1,18 @@
+from benchmark import bench_swap, bench_webcam, summarize
+
+def test_summarize_reports_percentiles_in_ms():
+    summary = summarize([0.001 * i for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == 51.0
+    assert summary["p99_ms"] == 100.0
+
+# Com latência zero o swap de ponta a ponta passa pela fila, pelo pool e pelo backend resiliente
+def test_swap_benchmark_against_stub():
+    result = bench_swap(requests=4, concurrency=2, latency=0, workers=2)
+    assert result["count"] == 4
+    assert result["throughput_per_s"] > 0
+
+def test_webcam_benchmark_runs_recv():
+    result = bench_webcam(frames=3)
+    assert set(result) == {"yuv420p", "bgr24"}
+    assert result["bgr24"]["count"] == 3
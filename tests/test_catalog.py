@@ -0,0 +1,35 @@
+import json
+import os
+import pytest
+from catalog import CatalogError, load_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG = os.path.join(ROOT, "styles", "catalog.json")
+
+def test_catalog_indexes_by_id_category_and_tag():
+    catalog = load_catalog(CATALOG)
+    style = catalog.get("corte-side-part")
+    assert style["file"] == "1.jpg"
+    assert style["path"] == os.path.join(ROOT, "styles", "1.jpg")
+    assert [s["id"] for s in catalog.in_category("Longos")] == ["topete-2", "mullet-1", "mullet-2", "topete-3"]
+    assert all("degradê" in s["tags"] for s in catalog.with_tag("degrade"))
+
+# A busca ignora acentos e exige todas as palavras
+def test_catalog_search():
+    catalog = load_catalog(CATALOG)
+    assert [s["id"] for s in catalog.search("mullet")] == ["mullet-1", "mullet-2"]
+    assert {s["id"] for s in catalog.search("degrade", category="Clássicos")} <= {
+        s["id"] for s in catalog.in_category("Clássicos")
+    }
+    assert catalog.search("topete volume longos")
+    assert catalog.search("nao existe") == []
+
+def test_catalog_rejects_missing_files(tmp_path):
+    manifest = {
+        "categories": ["Clássicos"],
+        "styles": [{"id": "a", "name": "A", "category": "Clássicos", "file": "a.jpg", "sha256": "0"}],
+    }
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(manifest), encoding="utf-8")
+    with pytest.raises(CatalogError):
+        load_catalog(str(path))
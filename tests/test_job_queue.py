@@ -0,0 +1,73 @@
+import threading
+import time
+import pytest
+from job_queue import JobQueue, QueueFullError, CANCELLED, DONE, QUEUED, RUNNING
+
+def _wait_status(job_queue, job_id, expected, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job_queue.status(job_id)["status"] != expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job_queue.status(job_id)["status"] == expected
+
+# Fila com o único worker ocupado até `release` ser liberado
+def _busy_queue(**kwargs):
+    release = threading.Event()
+    job_queue = JobQueue(workers=1, **kwargs)
+    blocker = job_queue.submit(release.wait)
+    _wait_status(job_queue, blocker, RUNNING)
+    return job_queue, blocker, release
+
+def test_same_key_runs_once():
+    job_queue, _, release = _busy_queue()
+    calls = []
+    first = job_queue.submit(calls.append, "a", key="k")
+    second = job_queue.submit(calls.append, "a", key="k")
+    assert first == second
+    assert job_queue.depth == 1
+
+    release.set()
+    _wait_status(job_queue, first, DONE)
+    assert calls == ["a"]
+
+# Um job compartilhado só é cancelado quando todos os interessados desistem
+def test_cancel_shared_job():
+    job_queue, _, release = _busy_queue()
+    job_id = job_queue.submit(time.sleep, 0, key="k")
+    job_queue.submit(time.sleep, 0, key="k")
+
+    assert job_queue.cancel(job_id)
+    assert job_queue.status(job_id)["status"] == QUEUED
+    assert job_queue.cancel(job_id)
+    assert job_queue.status(job_id)["status"] == CANCELLED
+    assert job_queue.depth == 0
+    release.set()
+
+def test_running_job_cannot_be_cancelled():
+    job_queue, blocker, release = _busy_queue()
+    assert not job_queue.cancel(blocker)
+    release.set()
+    _wait_status(job_queue, blocker, DONE)
+
+def test_position_and_eta():
+    job_queue, _, release = _busy_queue()
+    job_ids = [job_queue.submit(time.sleep, 0) for _ in range(3)]
+    assert [job_queue.status(job_id)["position"] for job_id in job_ids] == [1, 2, 3]
+    etas = [job_queue.status(job_id)["eta"] for job_id in job_ids]
+    assert etas == sorted(etas) and etas[0] > 0
+    release.set()
+
+# Jobs cancelados que ainda não foram descartados pelo worker não ocupam vaga
+def test_capacity_ignores_cancelled_jobs():
+    job_queue, _, release = _busy_queue(max_queued=3)
+    job_ids = [job_queue.submit(time.sleep, 0) for _ in range(3)]
+    with pytest.raises(QueueFullError):
+        job_queue.submit(time.sleep, 0)
+
+    for job_id in job_ids:
+        assert job_queue.cancel(job_id)
+    assert job_queue.depth == 0
+    new_ids = [job_queue.submit(time.sleep, 0) for _ in range(3)]
+
+    release.set()
+    for job_id in new_ids:
+        _wait_status(job_queue, job_id, DONE)
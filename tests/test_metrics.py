@@ -0,0 +1,55 @@
+import gc
+from metrics import ActiveTracker, MetricsRegistry
+
+def test_timer_feeds_histogram_summary():
+    registry = MetricsRegistry()
+    for value in (0.01, 0.02, 0.03, 0.5):
+        registry.observe("stage_seconds", value, stage="a")
+    with registry.timer("stage_seconds", stage="a"):
+        pass
+    summary = registry.snapshot()["histograms"][("stage_seconds", (("stage", "a"),))]
+    assert summary["count"] == 5
+    assert summary["p50_ms"] == 20.0
+    assert summary["p99_ms"] == 500.0
+
+def test_prometheus_export():
+    registry = MetricsRegistry()
+    registry.inc("jobs_total", status="done")
+    registry.inc("jobs_total", status="done")
+    registry.register_gauge("queue_depth", lambda: 3)
+    registry.observe("swap_seconds", 0.2)
+    text = registry.render_prometheus()
+    assert "# TYPE jobs_total counter" in text
+    assert 'jobs_total{status="done"} 2' in text
+    assert "queue_depth 3.0" in text
+    assert 'swap_seconds_bucket{le="0.1"} 0' in text
+    assert 'swap_seconds_bucket{le="0.25"} 1' in text
+    assert 'swap_seconds_bucket{le="+Inf"} 1' in text
+    assert "swap_seconds_count 1" in text
+
+# O gauge desce no release() ou quando o dono é coletado, uma única vez
+def test_active_tracker_counts_live_objects():
+    class Owner:
+        pass
+
+    registry = MetricsRegistry()
+    first, second = Owner(), Owner()
+    first_tracker = ActiveTracker(first, "sessions", registry)
+    ActiveTracker(second, "sessions", registry)
+    assert registry.snapshot()["gauges"][("sessions", ())] == 2
+    first_tracker.release()
+    first_tracker.release()
+    del second
+    gc.collect()
+    assert registry.snapshot()["gauges"][("sessions", ())] == 0
+
+# Contadores mantidos por outros objetos (ex.: acertos do cache) saem como counter
+def test_registered_counter_is_exported_as_counter():
+    registry = MetricsRegistry()
+    hits = [3]
+    registry.register_counter("cache_hits", lambda: hits[0])
+    hits[0] += 1
+    assert registry.snapshot()["counters"][("cache_hits", ())] == 4
+    text = registry.render_prometheus()
+    assert "# TYPE cache_hits counter" in text
+    assert "cache_hits 4" in text
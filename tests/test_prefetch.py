@@ -0,0 +1,70 @@
+import os
+import time
+from backends import ClientPool, RemoteBackend, StubClient
+from job_queue import JobQueue
+from prefetch import Prefetcher, prefetch_order
+from result_cache import ResultCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "1.jpg")
+STYLES = [{"id": name, "path": os.path.join(ROOT, "styles", f"{name}.jpg")} for name in ("1", "2", "3", "4")]
+
+def _prefetcher(latency=0.0, **kwargs):
+    backend = RemoteBackend(ClientPool(lambda: StubClient(latency=latency)), name="stub")
+    return Prefetcher(JobQueue(workers=1), backend, ResultCache(cache_dir=""), **kwargs)
+
+def _wait(prefetcher, timeout=5):
+    deadline = time.monotonic() + timeout
+    while prefetcher.active and time.monotonic() < deadline:
+        prefetcher.step()
+        time.sleep(0.01)
+
+def test_prefetch_order_follows_gallery_page():
+    assert prefetch_order("b", ["a", "b", "c", "d"], next_styles=2) == ["b", "c", "d"]
+    assert prefetch_order("d", ["a", "b", "c", "d"], next_styles=2) == ["d", "a", "b"]
+    assert prefetch_order("x", ["a", "b"], next_styles=3) == ["x", "a", "b"]
+
+def test_prefetch_fills_result_cache_within_budget():
+    prefetcher = _prefetcher(budget=2)
+    prefetcher.set_source(SOURCE, "digest")
+    prefetcher.request(STYLES)
+    _wait(prefetcher)
+    cached = [style["id"] for style in STYLES if prefetcher._key(style["id"]) in prefetcher.result_cache]
+    assert cached == ["1", "2"]
+    assert prefetcher.remaining == 0
+
+    # Um estilo aplicado pelo usuário devolve o orçamento
+    prefetcher.mark_used("1")
+    _wait(prefetcher)
+    assert prefetcher._key("3") in prefetcher.result_cache
+
+# Uma foto nova cancela o que ainda estava na fila e devolve o orçamento
+def test_new_source_cancels_queued_prefetch():
+    prefetcher = _prefetcher(latency=0.3, budget=4, parallelism=2, max_queue_depth=4)
+    prefetcher.set_source(SOURCE, "old")
+    prefetcher.request(STYLES)
+    prefetcher.step()
+    assert len(prefetcher.jobs) == 2
+    while prefetcher.job_queue.running == 0:
+        time.sleep(0.01)
+    prefetcher.set_source(SOURCE, "new")
+    assert prefetcher.jobs == {}
+    # Só o job que já estava rodando foi gasto
+    assert prefetcher.spent == 1
+
+# Estilo aplicado enquanto o job especulativo ainda está na fila: o clique
+# entra no mesmo job e o cancelamento posterior não devolve o orçamento de novo
+def test_used_style_is_refunded_once():
+    prefetcher = _prefetcher(latency=0.3, budget=4, parallelism=2, max_queue_depth=4)
+    prefetcher.set_source(SOURCE, "digest")
+    prefetcher.request(STYLES)
+    prefetcher.step()
+    while prefetcher.job_queue.running == 0:
+        time.sleep(0.01)
+
+    prefetcher.mark_used("2")
+    prefetcher.job_queue.submit(time.sleep, 0, key=prefetcher._key("2"))
+    prefetcher.cancel()
+    # Só o estilo "1", que já estava rodando, continua gasto
+    assert prefetcher.spent == 1
+    assert prefetcher.remaining == 3
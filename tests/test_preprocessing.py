@@ -0,0 +1,55 @@
+import os
+from io import BytesIO
+import pytest
+from PIL import Image
+import image_utils
+from image_utils import InvalidImageError, decode_upload, upload_fingerprint
+from preprocessing import prepare_source
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_prepare_source_crops_face_to_target_size():
+    image = prepare_source(Image.open(os.path.join(ROOT, "1.jpg")), (400, 400))
+    assert image.size == (400, 400)
+    assert image.mode == "RGB"
+
+# A orientação do EXIF é aplicada antes da detecção
+def test_prepare_source_applies_exif_orientation(tmp_path):
+    path = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotacionada 90° no sentido horário
+    Image.new("RGB", (300, 200), (200, 150, 120)).save(path, exif=exif)
+    image = prepare_source(Image.open(path), (400, 400))
+    assert image.size == (400, 400)
+
+def test_prepare_source_without_face_falls_back_to_resize():
+    image = prepare_source(Image.new("RGBA", (800, 200), (255, 255, 255, 255)), (400, 400))
+    assert image.size == (400, 400)
+    assert image.mode == "RGB"
+
+def _jpeg_bytes(size):
+    buffer = BytesIO()
+    Image.open(os.path.join(ROOT, "1.jpg")).resize(size).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def test_decode_upload_downscales_large_photo():
+    image = decode_upload(_jpeg_bytes((4000, 3000)), max_side=1024)
+    assert max(image.size) == 1024
+    assert image.mode == "RGB"
+
+def test_decode_upload_rejects_malformed_and_truncated_files():
+    with pytest.raises(InvalidImageError):
+        decode_upload(b"not an image")
+    with pytest.raises(InvalidImageError):
+        decode_upload(_jpeg_bytes((2000, 1500))[:4000])
+
+# As dimensões são verificadas pelo cabeçalho, antes de decodificar
+def test_decode_upload_rejects_too_many_pixels(monkeypatch):
+    monkeypatch.setattr(image_utils, "UPLOAD_MAX_PIXELS", 1000 * 1000)
+    with pytest.raises(InvalidImageError):
+        decode_upload(_jpeg_bytes((2000, 1500)))
+
+def test_upload_fingerprint_depends_on_content():
+    data = _jpeg_bytes((400, 400))
+    assert upload_fingerprint(data) == upload_fingerprint(bytes(data))
+    assert upload_fingerprint(data) != upload_fingerprint(data + b"\0")
@@ -0,0 +1,154 @@
+import os
+import time
+import pytest
+from gradio_client.exceptions import AppError
+from gradio_client.utils import QueueError, TooManyRequestsError
+from backends import ClientPool, RemoteBackend, ResilientBackend, StubClient
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, call_with_retries, is_transient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "1.jpg")
+STYLE = os.path.join(ROOT, "styles", "3.jpg")
+
+# Backend que falha nas primeiras `failures` chamadas
+class FlakyBackend:
+    name = "flaky"
+    workers = None
+
+    def __init__(self, failures, error=TimeoutError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def swap(self, source_path, target_path, slider=100, adv_slider=100):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("backend fora do ar")
+        return b"ok"
+
+    def health(self):
+        return True
+
+def test_retries_only_transient_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert call_with_retries(flaky, attempts=3, wait=0.001, max_wait=0.001) == "ok"
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("nenhum rosto")
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        call_with_retries(invalid, attempts=3, wait=0.001, max_wait=0.001)
+    assert len(calls) == 1
+
+def test_circuit_opens_then_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.before_call() is True
+    # Só uma chamada de teste por vez
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+def test_resilient_backend_fails_fast_when_open():
+    flaky = FlakyBackend(failures=100)
+    backend = ResilientBackend(flaky, CircuitBreaker(failure_threshold=2, reset_timeout=60), retries=1)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            backend.swap(SOURCE, STYLE)
+    with pytest.raises(CircuitOpenError):
+        backend.swap(SOURCE, STYLE)
+    with pytest.raises(CircuitOpenError):
+        backend.check()
+    assert flaky.calls == 2
+
+# Erros do pedido (ex.: foto sem rosto) não abrem o circuito
+def test_resilient_backend_ignores_request_errors():
+    backend = ResilientBackend(FlakyBackend(failures=3, error=ValueError),
+                               CircuitBreaker(failure_threshold=2), retries=3)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            backend.swap(SOURCE, STYLE)
+    assert backend.breaker.state == CLOSED
+    assert backend.swap(SOURCE, STYLE) == b"ok"
+
+def test_remote_backend_times_out():
+    backend = RemoteBackend(ClientPool(lambda: StubClient(latency=1.0)), name="stub", timeout=0.05)
+    with pytest.raises(TimeoutError):
+        backend.swap(SOURCE, STYLE)
+    # O cliente que estourou o tempo é descartado
+    assert backend.pool.created == 0
+
+# Erros que o gradio_client levanta com o Space sobrecarregado ou fora do ar
+GRADIO_OUTAGES = [
+    lambda message: TooManyRequestsError(message),
+    lambda message: QueueError("Queue is full! Please try again."),
+    lambda message: AppError(message),
+    lambda message: ValueError("Could not fetch config for https://felixrosberg-face-swap.hf.space/"),
+]
+
+def test_gradio_outages_are_transient():
+    for error in GRADIO_OUTAGES:
+        assert is_transient(error("fora do ar"))
+    assert not is_transient(ValueError("nenhum rosto"))
+
+@pytest.mark.parametrize("error", GRADIO_OUTAGES)
+def test_gradio_outages_open_the_circuit(error):
+    backend = ResilientBackend(FlakyBackend(failures=100, error=error),
+                               CircuitBreaker(failure_threshold=2, reset_timeout=60), retries=1)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            backend.swap(SOURCE, STYLE)
+    assert backend.breaker.state == OPEN
+
+# Cada tentativa conta no disjuntor; aberto o circuito, as tentativas param
+def test_each_attempt_counts_as_a_failure():
+    flaky = FlakyBackend(failures=100)
+    backend = ResilientBackend(flaky, CircuitBreaker(failure_threshold=2, reset_timeout=60), retries=3)
+    with pytest.raises(CircuitOpenError):
+        backend.swap(SOURCE, STYLE)
+    assert flaky.calls == 2
+    assert backend.breaker.state == OPEN
+
+# Handshake travado (Space acordando): a criação do cliente também tem limite
+def test_client_creation_times_out():
+    closed = []
+
+    class SlowClient(StubClient):
+        def __init__(self):
+            time.sleep(0.2)
+            super().__init__(latency=0)
+
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    pool = ClientPool(SlowClient, size=1, create_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        with pool.client():
+            pass
+    assert pool.created == 0
+
+    # O cliente criado depois do timeout é fechado, e a vaga do pool foi liberada
+    time.sleep(0.3)
+    assert len(closed) == 1
+    pool.create_timeout = None
+    with pool.client() as client:
+        assert isinstance(client, SlowClient)
@@ -0,0 +1,37 @@
+import os
+from result_cache import ResultCache
+
+def _age(cache, key, mtime):
+    os.utime(cache._disk_path(key), (mtime, mtime))
+
+# Passando do limite em disco, sai o arquivo com o acesso mais antigo
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(max_items=1, cache_dir=str(tmp_path), max_disk_bytes=250)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    _age(cache, "a", 1000)
+    _age(cache, "b", 2000)
+
+    # A leitura do disco renova o "a", então o "b" passa a ser o mais antigo
+    assert cache.get("a") == b"a" * 100
+    cache.put("c", b"c" * 100)
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg", "c.jpg"]
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache._disk_bytes == 200
+
+# Um processo novo reaproveita os resultados gravados e o tamanho já ocupado
+def test_disk_tier_survives_restart(tmp_path):
+    ResultCache(cache_dir=str(tmp_path)).put("a", b"resultado")
+    cache = ResultCache(cache_dir=str(tmp_path))
+    assert cache._disk_bytes == len(b"resultado")
+    assert cache.get("a") == b"resultado"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_memory_only_cache(tmp_path):
+    cache = ResultCache(max_items=1, cache_dir="")
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"2"
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,28 @@
+import os
+import numpy as np
+from PIL import Image
+from catalog import load_catalog
+from style_index import EMBEDDING_DIMS, StyleIndex, embed_pil, load_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_embedding_has_fixed_size():
+    vector = embed_pil(Image.open(os.path.join(ROOT, "1.jpg")))
+    assert vector.shape == (EMBEDDING_DIMS,)
+    assert np.isfinite(vector).all()
+
+def test_nearest_ranks_by_distance():
+    vectors = np.zeros((4, EMBEDDING_DIMS), np.float32)
+    vectors[:, 0] = [0.0, 1.0, 2.0, 3.0]
+    index = StyleIndex(["a", "b", "c", "d"], vectors)
+    query = vectors[2].copy()
+    query[0] += 0.1
+    assert index.nearest(query, k=3) == ["c", "d", "b"]
+    assert index.nearest(query, k=3, allowed={"a", "b"}) == ["b", "a"]
+
+# O índice versionado no repositório precisa acompanhar o catálogo
+def test_shipped_index_matches_catalog():
+    catalog = load_catalog(os.path.join(ROOT, "styles", "catalog.json"))
+    index = load_index(os.path.join(ROOT, "styles", "style_index.npz"))
+    assert index.matches(catalog)
+    assert set(index.nearest(index.vectors[0], k=5)) <= {style["id"] for style in catalog.styles}
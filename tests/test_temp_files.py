@@ -0,0 +1,55 @@
+import gc
+import os
+import pytest
+from temp_files import QuotaExceededError, TempFileManager, TempSession
+
+def _age(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+# Com a cota cheia, os arquivos mais antigos da própria sessão saem primeiro
+def test_write_evicts_oldest_files_over_quota(tmp_path):
+    manager = TempFileManager(root=str(tmp_path), quota=250)
+    first = manager.write("s1", b"1" * 100)
+    second = manager.write("s1", b"2" * 100)
+    other = manager.write("s2", b"3" * 100)
+    _age(first, 1000)
+    _age(second, 2000)
+
+    third = manager.write("s1", b"4" * 100)
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    assert manager.usage("s1") == 200
+    # A cota é por sessão
+    assert os.path.exists(other)
+
+def test_write_larger_than_quota_raises(tmp_path):
+    manager = TempFileManager(root=str(tmp_path), quota=10)
+    with pytest.raises(QuotaExceededError):
+        manager.write("s1", b"x" * 11)
+    assert manager.usage("s1") == 0
+
+# O sweeper apaga arquivos vencidos e os diretórios de sessão que ficaram vazios
+def test_sweep_removes_expired_files(tmp_path):
+    manager = TempFileManager(root=str(tmp_path), ttl=60)
+    expired = manager.write("s1", b"velho")
+    fresh = manager.write("s2", b"novo")
+    _age(expired, 1000)
+
+    assert manager.sweep() == 1
+    assert not os.path.exists(os.path.dirname(expired))
+    assert os.path.exists(fresh)
+
+def test_session_release_removes_its_files(tmp_path):
+    manager = TempFileManager(root=str(tmp_path))
+    session = TempSession(manager)
+    path = session.write(b"foto")
+    assert session.usage() == len(b"foto")
+    session.release()
+    assert not os.path.exists(os.path.dirname(path))
+
+    # Sessão coletada pelo garbage collector (fim da sessão do Streamlit)
+    session = TempSession(manager)
+    path = session.write(b"foto")
+    del session
+    gc.collect()
+    assert not os.path.exists(os.path.dirname(path))
@@ -0,0 +1,24 @@
+import os
+from catalog import load_catalog
+from thumbnails import ThumbnailCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG = load_catalog(os.path.join(ROOT, "styles", "catalog.json"))
+
+# O build gera as miniaturas com a chave que o app consulta (hash do catálogo),
+# então um processo novo lê do disco sem renderizar nada
+def test_build_matches_app_lookup(tmp_path, monkeypatch):
+    stale = tmp_path / "obsoleta.jpg"
+    stale.write_bytes(b"x")
+    built, removed = ThumbnailCache(cache_dir=str(tmp_path)).build(CATALOG)
+    assert built == len(CATALOG)
+    assert removed == 1
+    assert not stale.exists()
+
+    cache = ThumbnailCache(cache_dir=str(tmp_path))
+    monkeypatch.setattr(cache, "_render", lambda path, size: (_ for _ in ()).throw(AssertionError(path)))
+    style = CATALOG.styles[0]
+    assert cache.get(style["thumbnail_path"], version=style["sha256"])[:2] == b"\xff\xd8"
+
+    # Rodar o build de novo não apaga o que o app gravou
+    assert ThumbnailCache(cache_dir=str(tmp_path)).build(CATALOG) == (len(CATALOG), 0)
@@ -0,0 +1,110 @@
+import os
+import sys
+import hashlib
+import threading
+from cachetools import LRUCache
+from image_utils import resize_image, open_image_draft, encode_jpeg, write_atomic
+from catalog import CATALOG_FILE, load_catalog
+
+# Tamanho padrão das miniaturas da galeria
+THUMBNAIL_SIZE = (400, 400)
+
+# Quantidade máxima de miniaturas mantidas em memória (evicção LRU)
+THUMBNAIL_CACHE_ITEMS = int(os.environ.get("THUMBNAIL_CACHE_ITEMS", "256"))
+
+# Diretório de persistência em disco; só é usado se existir (criado pelo build)
+THUMBNAIL_DIR = os.environ.get("THUMBNAIL_DIR", ".thumbnails")
+
+# Cache de miniaturas compartilhado pelo processo inteiro (todas as sessões)
+class ThumbnailCache:
+    def __init__(self, max_items=THUMBNAIL_CACHE_ITEMS, cache_dir=THUMBNAIL_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._memory = LRUCache(maxsize=max_items)
+        self._lock = threading.Lock()
+
+    # A chave muda quando o arquivo é alterado (mtime) ou o tamanho pedido muda.
+    # Com `version` (ex.: hash do catálogo) o arquivo não é consultado.
+    def _key(self, path, target_size, version=None):
+        if version is None:
+            version = os.stat(path).st_mtime_ns
+        return (os.path.abspath(path), version, tuple(target_size))
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.jpg")
+
+    def _disk_enabled(self):
+        return bool(self.cache_dir) and os.path.isdir(self.cache_dir)
+
+    def _render(self, path, target_size):
+        image = open_image_draft(path, target_size)
+        return encode_jpeg(resize_image(image, target_size))
+
+    # Retorna os bytes JPEG da miniatura de `path` no tamanho `target_size`
+    def get(self, path, target_size=THUMBNAIL_SIZE, version=None):
+        key = self._key(path, target_size, version)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = None
+        disk_path = self._disk_path(key) if self._disk_enabled() else None
+        if disk_path and os.path.exists(disk_path):
+            with open(disk_path, "rb") as f:
+                data = f.read()
+
+        if data is None:
+            data = self._render(path, target_size)
+            if disk_path:
+                write_atomic(disk_path, data)
+
+        with self._lock:
+            self._memory[key] = data
+        return data
+
+    # Gera as miniaturas de todos os estilos do catálogo, com a mesma chave
+    # usada pelo app (caminho, hash do catálogo e tamanho), e remove as obsoletas
+    def build(self, catalog, target_size=THUMBNAIL_SIZE):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        valid = set()
+        for style in catalog.styles:
+            for path in (style["thumbnail_path"], style["path"]):
+                self.get(path, target_size, style["sha256"])
+                valid.add(os.path.basename(self._disk_path(self._key(path, target_size, style["sha256"]))))
+
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".jpg") and name not in valid:
+                os.unlink(os.path.join(self.cache_dir, name))
+                removed += 1
+        return len(valid), removed
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+# Instância única do cache, criada na primeira utilização
+def get_thumbnail_cache():
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _thumbnail_cache_lock:
+            if _thumbnail_cache is None:
+                _thumbnail_cache = ThumbnailCache()
+    return _thumbnail_cache
+
+def get_thumbnail(path, target_size=THUMBNAIL_SIZE, version=None):
+    return get_thumbnail_cache().get(path, target_size, version)
+
+# Build das miniaturas: python thumbnails.py [caminho_do_catalogo]
+if __name__ == "__main__":
+    catalog_file = sys.argv[1] if len(sys.argv) > 1 else CATALOG_FILE
+    built, removed = get_thumbnail_cache().build(load_catalog(catalog_file))
+    print(f"{built} miniaturas geradas em '{THUMBNAIL_DIR}' ({removed} obsoletas removidas)")
@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import deque
+import av
+import cv2
+from PIL import Image
+from face_detection import FaceTracker, LatencyStats, DETECTION_INTERVAL
+from metrics import ActiveTracker, timer
+
+# Quantos frames avaliados (com detecção) ficam guardados para escolher a foto
+FRAME_BUFFER_SIZE = int(os.environ.get("FRAME_BUFFER_SIZE", "8"))
+
+# Qualidade mínima para aceitar uma foto da câmera
+MIN_FRAME_SCORE = float(os.environ.get("MIN_FRAME_SCORE", "0.2"))
+
+# Função para processar o quadro da webcam
+class VideoProcessor:
+    def __init__(self, detection_interval=DETECTION_INTERVAL, buffer_size=FRAME_BUFFER_SIZE):
+        self.tracker = FaceTracker(interval=detection_interval)
+        self.stats = LatencyStats()
+        self._recent = deque(maxlen=buffer_size)
+        self._frame_lock = threading.Lock()
+        # Sessões de câmera ativas no processo (métrica webcam_sessions_active)
+        self._active = ActiveTracker(self, "webcam_sessions_active")
+
+    # Escolhe o melhor frame recente (rosto centralizado, nítido e bem exposto)
+    # e converte para PIL Image (RGB). A cópia e a conversão de cores só
+    # acontecem aqui, quando a foto é de fato tirada.
+    # Retorna (imagem, qualidade); a imagem é None se nenhum frame for bom o bastante.
+    def get_snapshot(self, min_score=MIN_FRAME_SCORE):
+        with self._frame_lock:
+            candidates = list(self._recent)
+        if not candidates:
+            return None, None
+
+        quality, frame = max(candidates, key=lambda c: c[0]["score"])
+        if quality["score"] < min_score:
+            return None, quality
+        return Image.fromarray(frame.to_ndarray(format="rgb24")), quality
+
+    # Chamado pelo streamlit-webrtc quando a câmera é desligada
+    def on_ended(self):
+        self._active.release()
+
+    def recv(self, frame):
+        with self.stats.timer(), timer("webcam_frame_seconds"):
+            img = frame.to_ndarray(format="bgr24")
+            # Se o frame já vier em bgr24 o array aponta para o mesmo buffer;
+            # copiar para que as marcações não apareçam na foto
+            if frame.format.name == "bgr24":
+                img = img.copy()
+
+            # Desenha um contorno para o rosto, para indicar o posicionamento.
+            # A detecção roda em frames espaçados; nos outros as caixas são reaproveitadas.
+            try:
+                faces, detected = self.tracker.update(img)
+
+                # Frames com detecção entram na janela de candidatos à foto
+                if detected:
+                    with self._frame_lock:
+                        self._recent.append((self.tracker.quality, frame))
+
+                for (x, y, w, h) in faces:
+                    cv2.rectangle(img, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                    # Adicionar texto indicativo
+                    cv2.putText(img, "Rosto detectado", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+            except cv2.error:
+                pass  # Ignorar erros de detecção de rosto
+
+            return av.VideoFrame.from_ndarray(img, format="bgr24")